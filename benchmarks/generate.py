@@ -0,0 +1,57 @@
+import argparse
+import csv
+import random
+from datetime import date, timedelta
+
+CITIES = ["New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio", "San Diego"]
+FIRST_DATE = date(2015, 1, 1)
+
+# Dirty cells look like the ones in data.csv: a lone space where a value should be
+BLANK = " "
+
+
+# Deterministic synthetic CSV: the same arguments always give the same bytes.
+#   numeric / categorical / dates: how many columns of each kind
+#   dirty_rate: fraction of cells replaced by a blank
+#   quoting: 'minimal' (only when needed), 'all', or 'none' (never; commas are dropped)
+def generate_csv(filename, rows, numeric=3, categorical=2, dates=1, dirty_rate=0.01, quoting='minimal', seed=0):
+    rng = random.Random(seed)
+    header = ["Name"]
+    header += [f"Category{i}" for i in range(categorical)]
+    header += [f"Date{i}" for i in range(dates)]
+    header += [f"Value{i}" for i in range(numeric)]
+
+    quote_mode = {'minimal': csv.QUOTE_MINIMAL, 'all': csv.QUOTE_ALL, 'none': csv.QUOTE_NONE}[quoting]
+    with open(filename, 'w', newline='') as file:
+        writer = csv.writer(file, quoting=quote_mode, escapechar='\\' if quoting == 'none' else None)
+        writer.writerow(header)
+        for row_number in range(rows):
+            row = [f"Person {row_number}"]
+            row += [rng.choice(CITIES) for _ in range(categorical)]
+            row += [(FIRST_DATE + timedelta(days=rng.randrange(3650))).isoformat() for _ in range(dates)]
+            row += [str(rng.randint(18, 90)) if i == 0 else f"{rng.gauss(60000, 15000):.2f}" for i in range(numeric)]
+            if dirty_rate:
+                row = [BLANK if rng.random() < dirty_rate else cell for cell in row]
+                # Every so often a name with a comma, so quoting matters
+                if quoting != 'none' and rng.random() < dirty_rate:
+                    row[0] = f"{row[0]}, Jr."
+            writer.writerow(row)
+    return header
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a reproducible synthetic CSV file.")
+    parser.add_argument("filename")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--numeric", type=int, default=3)
+    parser.add_argument("--categorical", type=int, default=2)
+    parser.add_argument("--dates", type=int, default=1)
+    parser.add_argument("--dirty-rate", type=float, default=0.01)
+    parser.add_argument("--quoting", choices=("minimal", "all", "none"), default="minimal")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate_csv(args.filename, args.rows, args.numeric, args.categorical, args.dates, args.dirty_rate, args.quoting, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import csv_index
+from csv_cache import read_header
+from csv_engine import analyze
+from csv_table import load_table
+from generate import generate_csv
+
+DEFAULT_SIZES = [10 ** 4, 10 ** 5, 10 ** 6]
+DATA_DIR = os.path.join(HERE, "data")
+HISTORY_FILE = os.path.join(HERE, "history.json")
+
+# A stage counts as a regression when it is this much slower than last time
+REGRESSION_RATIO = 1.10
+
+# Above this many rows the in-memory table stages are skipped (a table of
+# 10^8 rows does not fit in memory); the stream and parallel stages always run
+DEFAULT_MAX_TABLE_ROWS = 10 ** 7
+
+
+def dataset(rows, options):
+    name = f"bench_{rows}_{options['numeric']}n{options['categorical']}c{options['dates']}d_{options['dirty_rate']}_{options['quoting']}.csv"
+    filename = os.path.join(DATA_DIR, name)
+    if not os.path.exists(filename):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"Generating {name} ...", file=sys.stderr)
+        generate_csv(filename, rows, options['numeric'], options['categorical'], options['dates'], options['dirty_rate'], options['quoting'])
+    return filename
+
+
+# Best wall time of `repeat` calls; warnings printed by the code under test are discarded
+def best_time(function, repeat):
+    best = None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# Parse + statistics of the value columns the way the engine streams them,
+# without keeping the rows. The row index the first scan builds is dropped
+# every time so that each repeat reads the file the same way.
+def streamed(filename, value_columns, mode):
+    csv_index.memory_indexes.clear()
+    analyze(filename, selected_columns=value_columns, mode=mode)
+
+
+def run_stages(filename, repeat, table_stages=True):
+    timings = {}
+    value_columns = [name for name in read_header(filename) if name.startswith("Value")]
+    timings["stream"] = best_time(lambda: streamed(filename, value_columns, 'stream'), repeat)
+    timings["parallel"] = best_time(lambda: streamed(filename, value_columns, 'parallel'), repeat)
+    if not table_stages:
+        return timings
+
+    timings["parse"] = best_time(lambda: load_table(filename), repeat)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        table = load_table(filename)
+    date_columns = [name for name in table.header if name.startswith("Date")]
+
+    timings["filter"] = best_time(lambda: table.filter_rows("Category0", "Chicago"), repeat)
+    timings["sort"] = best_time(lambda: table.sort_rows(None, value_columns[0]), repeat)
+    timings["statistics"] = best_time(lambda: [table.column_stats(name) for name in value_columns], repeat)
+    if date_columns:
+        timings["dates"] = best_time(lambda: [table.date_stats(name) for name in date_columns], repeat)
+    timings["histogram"] = best_time(lambda: [table.histogram(name) for name in value_columns], repeat)
+    return timings
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history():
+    try:
+        with open(HISTORY_FILE, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return []
+
+
+# The latest run in the history that timed the same kind of data on the same
+# machine; runs with other generator options are not comparable
+def previous_run(history, current):
+    for run in reversed(history):
+        if run.get('options') == current['options'] and run.get('machine') == current['machine']:
+            return run
+    return None
+
+
+def compare(previous, current):
+    print(f"\nCompared with {previous.get('label') or previous.get('revision')} ({previous['timestamp']}):")
+    if previous.get('python') != current['python']:
+        print(f"  Warning: that run used Python {previous.get('python')}, this one {current['python']}")
+    for rows, timings in current["results"].items():
+        if rows not in previous["results"]:
+            print(f"  {rows:>10} rows  not timed in that run")
+            continue
+        old_timings = previous["results"][rows]
+        for stage, seconds in timings.items():
+            old = old_timings.get(stage)
+            if old is None:
+                continue
+            ratio = seconds / old if old else float("inf")
+            flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+            print(f"  {rows:>10} rows  {stage:<10} {old:9.4f}s -> {seconds:9.4f}s  x{ratio:.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the CSV Analyzer pipeline stages on synthetic data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES, help="data sizes, e.g. 10000 1000000 100000000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--numeric", type=int, default=3)
+    parser.add_argument("--categorical", type=int, default=2)
+    parser.add_argument("--dates", type=int, default=1)
+    parser.add_argument("--dirty-rate", type=float, default=0.01)
+    parser.add_argument("--quoting", choices=("minimal", "all", "none"), default="minimal")
+    parser.add_argument("--max-table-rows", type=int, default=DEFAULT_MAX_TABLE_ROWS, help="only time the in-memory table stages up to this many rows")
+    parser.add_argument("--label", help="name for this run in the history")
+    parser.add_argument("--no-save", action="store_true", help="don't append this run to the history")
+    args = parser.parse_args(argv)
+
+    options = {
+        'numeric': args.numeric,
+        'categorical': args.categorical,
+        'dates': args.dates,
+        'dirty_rate': args.dirty_rate,
+        'quoting': args.quoting,
+    }
+    # Timings should not depend on whether a sidecar index happens to exist
+    csv_index.WRITE_INDEX = False
+
+    results = {}
+    for rows in args.rows:
+        filename = dataset(rows, options)
+        results[str(rows)] = timings = run_stages(filename, args.repeat, rows <= args.max_table_rows)
+        for stage, seconds in timings.items():
+            print(f"{rows:>10} rows  {stage:<10} {seconds:9.4f}s  ({rows / seconds:,.0f} rows/s)")
+
+    run = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'revision': git_revision(),
+        'label': args.label,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'options': options,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    history = load_history()
+    previous = previous_run(history, run)
+    if previous is not None:
+        compare(previous, run)
+    elif history:
+        print("\nNo earlier run with these data options on this machine to compare with.")
+    if not args.no_save:
+        history.append(run)
+        with open(HISTORY_FILE, "w") as file:
+            json.dump(history, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
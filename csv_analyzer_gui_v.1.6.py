@@ -0,0 +1,280 @@
+import tkinter as tk
+from tkinter import ttk
+from tkinter import filedialog
+from csv_cache import read_header
+from csv_columnar import FILE_TYPES
+from csv_engine import run_analysis
+from csv_jobs import BackgroundJob
+from csv_plots import PlotManager
+from csv_profile import profiler
+from csv_viewer import BatchInserter, DataGrid, DiagnosticsPanel, PerformancePanel
+
+# How often the GUI checks on a running background job
+JOB_POLL_MS = 100
+
+# Hide the results tree while a large result is being inserted
+DETACH_RESULTS_WHILE_FILLING = False
+
+class CSVAnalyzerGUI:
+    def __init__(self, master):
+        self.master = master
+        master.title("CSV Analyzer")
+
+        # Filename Label and Entry
+        self.filename_label = ttk.Label(master, text="CSV Filename:")
+        self.filename_label.grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        self.filename_entry = ttk.Entry(master, width=30)
+        self.filename_entry.grid(row=0, column=1, sticky=tk.E, padx=5, pady=5)
+
+        # Browse Button
+        self.browse_button = ttk.Button(master, text="Browse", command=self.browse_file)
+        self.browse_button.grid(row=0, column=2, padx=5, pady=5)
+
+        # Filter Column Label and Entry
+        self.filter_column_label = ttk.Label(master, text="Filter Column:")
+        self.filter_column_label.grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        self.filter_column_entry = ttk.Entry(master, width=30)
+        self.filter_column_entry.grid(row=1, column=1, sticky=tk.E, padx=5, pady=5)
+
+        # Filter Value Label and Entry
+        self.filter_value_label = ttk.Label(master, text="Filter Value:")
+        self.filter_value_label.grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
+        self.filter_value_entry = ttk.Entry(master, width=30)
+        self.filter_value_entry.grid(row=2, column=1, sticky=tk.E, padx=5, pady=5)
+
+        # Sort Column Label and Entry
+        self.sort_column_label = ttk.Label(master, text="Sort Column:")
+        self.sort_column_label.grid(row=3, column=0, sticky=tk.W, padx=5, pady=5)
+        self.sort_column_entry = ttk.Entry(master, width=30)
+        self.sort_column_entry.grid(row=3, column=1, sticky=tk.E, padx=5, pady=5)
+
+        # Date Column Label and Entry
+        self.date_column_label = ttk.Label(master, text="Date Column:")
+        self.date_column_label.grid(row=4, column=0, sticky=tk.W, padx=5, pady=5)
+        self.date_column_entry = ttk.Entry(master, width=30)
+        self.date_column_entry.grid(row=4, column=1, sticky=tk.E, padx=5, pady=5)
+
+        # Filter Expression Label and Entry (e.g. Age > 30 and City in (Chicago, Houston))
+        self.filter_expression_label = ttk.Label(master, text="Filter Expression:")
+        self.filter_expression_label.grid(row=5, column=0, sticky=tk.W, padx=5, pady=5)
+        self.filter_expression_entry = ttk.Entry(master, width=30)
+        self.filter_expression_entry.grid(row=5, column=1, sticky=tk.E, padx=5, pady=5)
+
+        # Group By Column Label and Entry: statistics for each value of this column
+        self.group_column_label = ttk.Label(master, text="Group By Column:")
+        self.group_column_label.grid(row=6, column=0, sticky=tk.W, padx=5, pady=5)
+        self.group_column_entry = ttk.Entry(master, width=30)
+        self.group_column_entry.grid(row=6, column=1, sticky=tk.E, padx=5, pady=5)
+
+        # Parallel parsing checkbox (opt-in, uses one process per core)
+        self.parallel_var = tk.BooleanVar()
+        self.parallel_check = ttk.Checkbutton(master, text="Parallel parsing", variable=self.parallel_var)
+        self.parallel_check.grid(row=4, column=2, padx=5, pady=5, sticky=tk.W)
+
+        # Append-only checkbox: re-analyzing a growing file (a log) only reads the new rows
+        self.incremental_var = tk.BooleanVar()
+        self.incremental_check = ttk.Checkbutton(master, text="Append-only file", variable=self.incremental_var)
+        self.incremental_check.grid(row=3, column=2, padx=5, pady=5, sticky=tk.W)
+
+        # Analyze Button
+        self.analyze_button = ttk.Button(master, text="Analyze CSV", command=self.analyze_csv)
+        self.analyze_button.grid(row=7, column=0, columnspan=2, pady=10)
+
+        # Visualize Button
+        self.visualize_button = ttk.Button(master, text="Visualize Data", command=self.visualize_data)
+        self.visualize_button.grid(row=7, column=2, columnspan=1, pady=10)
+
+        # Progress Bar and Cancel Button for background jobs
+        self.progress_bar = ttk.Progressbar(master, orient="horizontal", mode="determinate", maximum=100)
+        self.progress_bar.grid(row=9, column=0, columnspan=2, padx=5, pady=5, sticky=tk.EW)
+        self.cancel_button = ttk.Button(master, text="Cancel", command=self.cancel_job, state=tk.DISABLED)
+        self.cancel_button.grid(row=9, column=2, padx=5, pady=5)
+        self.job = None
+
+        # Results Treeview
+        self.results_label = ttk.Label(master, text="Results:")
+        self.results_label.grid(row=10, column=0, sticky=tk.W, padx=5, pady=5)
+        self.notebook = ttk.Notebook(master)
+        self.notebook.grid(row=11, column=0, columnspan=4, padx=5, pady=5, sticky=tk.NSEW)
+        self.results_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.results_frame, text="Statistics")
+        self.results_tree = ttk.Treeview(self.results_frame, columns=("Column", "Average", "Minimum", "Maximum", "Median", "Mode", "Standard Deviation"), show="tree headings")
+        self.results_tree.grid(row=0, column=0, sticky=tk.NSEW)
+        # The tree column only holds the expand arrows of group-by rows
+        self.results_tree.column("#0", width=30, stretch=False)
+
+        # Define Headings
+        self.results_tree.heading("Column", text="Column")
+        self.results_tree.heading("Average", text="Average")
+        self.results_tree.heading("Minimum", text="Minimum")
+        self.results_tree.heading("Maximum", text="Maximum")
+        self.results_tree.heading("Median", text="Median")
+        self.results_tree.heading("Mode", text="Mode")
+        self.results_tree.heading("Standard Deviation", text="Standard Deviation")
+
+        # Column widths
+        self.results_tree.column("Column", width=100)
+        self.results_tree.column("Average", width=100)
+        self.results_tree.column("Minimum", width=100)
+        self.results_tree.column("Maximum", width=100)
+        self.results_tree.column("Median", width=100)
+        self.results_tree.column("Mode", width=100)
+        self.results_tree.column("Standard Deviation", width=100)
+
+        # Add scrollbars
+        self.tree_scroll_y = ttk.Scrollbar(self.results_frame, orient="vertical", command=self.results_tree.yview)
+        self.tree_scroll_y.grid(row=0, column=1, sticky="ns")
+        self.results_tree.configure(yscrollcommand=self.tree_scroll_y.set)
+        self.results_inserter = BatchInserter(self.results_tree, detach=DETACH_RESULTS_WHILE_FILLING)
+
+        # Data Grid tab: the filtered and sorted rows themselves
+        self.data_grid = DataGrid(self.notebook)
+        self.notebook.add(self.data_grid, text="Data")
+
+        # Warnings tab: cells the last analysis skipped, counted per column
+        self.diagnostics_panel = DiagnosticsPanel(self.notebook)
+        self.notebook.add(self.diagnostics_panel, text="Warnings")
+
+        # Performance tab: how long each stage of the last job took
+        self.performance_panel = PerformancePanel(self.notebook, profiler)
+        self.notebook.add(self.performance_panel, text="Performance")
+
+        # One plot window, reused by every "Visualize Data"
+        self.plots = PlotManager(master)
+
+        # Status Bar with the timing summary of the last job
+        self.status_label = ttk.Label(master, text=profiler.summary(), relief=tk.SUNKEN, anchor=tk.W)
+        self.status_label.grid(row=12, column=0, columnspan=4, padx=5, pady=5, sticky=tk.EW)
+
+        # Column Selection Frame
+        self.column_frame = ttk.Frame(master)
+        self.column_frame.grid(row=8, column=0, columnspan=3, padx=5, pady=5, sticky=tk.W)
+
+        self.column_vars = {}
+        self.column_checkboxes = []
+
+        # Configure tags for Treeview
+        self.results_tree.tag_configure('header', font=('Arial', 10, 'bold'))
+        self.results_tree.tag_configure('odd', background='#f0f0ff')
+        self.results_tree.tag_configure('even', background='#e0e0ff')
+        self.results_tree.tag_configure('group', font=('Arial', 10, 'italic'))
+
+    def browse_file(self):
+        filename = filedialog.askopenfilename(initialdir=".", title="Select a data file", filetypes=FILE_TYPES)
+        self.filename_entry.delete(0, tk.END)
+        self.filename_entry.insert(0, filename)
+        self.update_column_checkboxes(filename)
+
+    def update_column_checkboxes(self, filename):
+        # Clear existing checkboxes
+        for checkbox in self.column_checkboxes:
+            checkbox.destroy()
+        self.column_vars = {}
+        self.column_checkboxes = []
+
+        try:
+            header = read_header(filename)
+            for i, column in enumerate(header):
+                self.column_vars[column] = tk.BooleanVar()
+                checkbox = tk.Checkbutton(self.column_frame, text=column, variable=self.column_vars[column])
+                checkbox.grid(row=0, column=i, padx=5, pady=5, sticky=tk.W)
+                self.column_checkboxes.append(checkbox)
+        except FileNotFoundError:
+            print(f"Error: File '{filename}' not found.")
+            return
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+
+    def analyze_csv(self):
+        filename = self.filename_entry.get()
+        filter_column = self.filter_column_entry.get()
+        filter_value = self.filter_value_entry.get()
+        sort_column = self.sort_column_entry.get()
+        date_column = self.date_column_entry.get()
+        selected_columns = [column for column, var in self.column_vars.items() if var.get()]
+        parallel = self.parallel_var.get()
+        incremental = self.incremental_var.get()
+        filter_expression = self.filter_expression_entry.get()
+        group_column = self.group_column_entry.get()
+
+        # Clear previous results (one Tk call, however many rows there were)
+        self.results_inserter.clear()
+
+        # The heavy lifting happens on a worker thread, show_results gets the rows to insert
+        self.start_job(run_analysis, (filename, filter_column, filter_value, sort_column, date_column, selected_columns, parallel, incremental, filter_expression, group_column),
+                       lambda result: self.show_results(result, filename))
+
+    def show_results(self, result, filename):
+        if result is None:
+            return
+        result_rows, view, diagnostics = result
+        self.diagnostics_panel.show(diagnostics, filename)
+        # The tree fills over several idle callbacks, so this stage ends in finish_stage
+        span = profiler.begin("results tree", len(result_rows), detached=True)
+        self.results_inserter.fill(result_rows, on_done=lambda: self.finish_stage(span))
+        with profiler.span("data grid"):
+            self.data_grid.set_view(view)
+
+    def finish_stage(self, span):
+        profiler.end(span)
+        self.show_performance()
+
+    def show_performance(self):
+        self.status_label.config(text=profiler.summary())
+        self.performance_panel.refresh()
+
+    def visualize_data(self):
+        filename = self.filename_entry.get()
+        selected_columns = [column for column, var in self.column_vars.items() if var.get()]
+        parallel = self.parallel_var.get()
+
+        # Loading and drawing both happen on the worker, Tk only shows the finished image
+        self.start_job(self.plots.load_and_render, (filename, selected_columns, parallel), self.plots.show)
+
+    # Background jobs: only one at a time, polled from the Tk event loop
+    def start_job(self, target, args, on_done):
+        if self.job is not None:
+            return
+        # Every job gets a fresh set of timings
+        profiler.reset()
+        self.job = BackgroundJob(target, *args).start()
+        self.analyze_button.config(state=tk.DISABLED)
+        self.visualize_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progress_bar['value'] = 0
+        self.master.after(JOB_POLL_MS, self.poll_job, on_done)
+
+    def poll_job(self, on_done):
+        job = self.job
+        self.progress_bar['value'] = job.progress.percent()
+        if not job.done:
+            self.master.after(JOB_POLL_MS, self.poll_job, on_done)
+            return
+
+        self.job = None
+        self.analyze_button.config(state=tk.NORMAL)
+        self.visualize_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        if job.cancelled:
+            self.progress_bar['value'] = 0
+            print("Cancelled.\n")
+        elif job.error is not None:
+            print(f"Error: {job.error}\n")
+        else:
+            on_done(job.result)
+        self.show_performance()
+
+    def cancel_job(self):
+        if self.job is not None:
+            self.job.cancel()
+
+
+def main():
+    root = tk.Tk()
+    CSVAnalyzerGUI(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
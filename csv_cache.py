@@ -0,0 +1,171 @@
+import os
+import threading
+from collections import OrderedDict
+
+from csv_columnar import columnar_format, read_columnar_schema, read_columnar_table
+from csv_reader import MappedCSV
+from csv_schema import read_schema
+from csv_table import extend_table, load_table
+
+# Memory the cache may hold on to, in MB (override with CSV_ANALYZER_CACHE_MB)
+DEFAULT_MEMORY_BUDGET_MB = 1024
+
+# Inferred schemas are small, this many files' worth are kept
+SCHEMA_CACHE_SIZE = 64
+
+
+# Identifies one version of a file on disk. Any write changes the size or the
+# mtime, so a stale table is never handed out.
+def file_fingerprint(filename):
+    stat = os.stat(filename)
+    return (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+
+
+# Parsed tables shared by every part of the app, least recently used first.
+# Tables are evicted from the front until the total size fits the budget; a
+# table bigger than the whole budget is returned but not kept.
+class TableCache:
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024):
+        self.memory_budget = memory_budget
+        self.tables = OrderedDict()
+        self.sizes = {}
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, filename):
+        key = file_fingerprint(filename)
+        with self.lock:
+            table = self.tables.get(key)
+            if table is not None:
+                self.tables.move_to_end(key)
+            return table
+
+    # The cached table of an older version of the same file, if any
+    def previous_version(self, path):
+        with self.lock:
+            for key, table in self.tables.items():
+                if key[0] == path:
+                    return table
+        return None
+
+    # With incremental=True a file that only had rows appended since it was
+    # cached has just the new rows parsed onto the cached table
+    def get_table(self, filename, progress=None, incremental=False):
+        table = self.lookup(filename)
+        if table is not None:
+            return table
+        key = file_fingerprint(filename)
+        table = self.previous_version(key[0]) if incremental else None
+        if table is None or not extend_table(table, filename, progress):
+            table = load_table(filename, progress, get_schema(filename))
+        self.put(key, table)
+        return table
+
+    # Parquet/Feather/Arrow files: only `columns` are read, and the row groups
+    # that can't match the filters are skipped (see csv_columnar), so the
+    # table is cached under the columns and filters it was read for
+    def get_columnar_table(self, filename, columns, expression=None, filter_column=None, filter_value=None, progress=None):
+        key = file_fingerprint(filename) + (tuple(columns), expression, filter_column, filter_value)
+        with self.lock:
+            table = self.tables.get(key)
+            if table is not None:
+                self.tables.move_to_end(key)
+                return table
+        table = read_columnar_table(filename, columns, get_schema(filename), block_filter(expression, filter_column, filter_value), progress)
+        self.put(key, table)
+        return table
+
+    def put(self, key, table):
+        size = table.nbytes()
+        with self.lock:
+            # Older versions of the same file are never going to be asked for again
+            for old_key in [old_key for old_key in self.tables if old_key[0] == key[0]]:
+                self.remove(old_key)
+            if size > self.memory_budget:
+                return
+            self.tables[key] = table
+            self.sizes[key] = size
+            self.used += size
+            self.evict()
+
+    def remove(self, key):
+        del self.tables[key]
+        self.used -= self.sizes.pop(key)
+
+    def evict(self):
+        while self.used > self.memory_budget and self.tables:
+            self.remove(next(iter(self.tables)))
+
+    def set_memory_budget(self, memory_budget):
+        with self.lock:
+            self.memory_budget = memory_budget
+            self.evict()
+
+    def clear(self):
+        with self.lock:
+            self.tables.clear()
+            self.sizes.clear()
+            self.used = 0
+
+
+table_cache = TableCache(int(os.environ.get('CSV_ANALYZER_CACHE_MB', DEFAULT_MEMORY_BUDGET_MB)) * 1024 * 1024)
+
+
+def get_table(filename, progress=None, incremental=False):
+    return table_cache.get_table(filename, progress, incremental)
+
+
+def get_columnar_table(filename, columns, expression=None, filter_column=None, filter_value=None, progress=None):
+    return table_cache.get_columnar_table(filename, columns, expression, filter_column, filter_value, progress)
+
+
+# may_match(bounds) for read_columnar_table from an expression and a
+# column = value filter on a numeric column, or None when neither can skip anything
+def block_filter(expression, filter_column, filter_value):
+    target = None
+    if filter_column is not None:
+        try:
+            target = float(filter_value)
+        except ValueError:
+            pass
+    if expression is None and target is None:
+        return None
+
+    def may_match(bounds):
+        if target is not None and filter_column in bounds:
+            low, high = bounds[filter_column]
+            if not low <= target <= high:
+                return False
+        return expression is None or expression.may_match(bounds)
+    return may_match
+
+
+def read_header(filename):
+    if columnar_format(filename) is not None:
+        return get_schema(filename).header
+    table = table_cache.lookup(filename)
+    if table is not None:
+        return table.header
+    with MappedCSV(filename) as reader:
+        return reader.header
+
+
+schemas = OrderedDict()
+schemas_lock = threading.Lock()
+
+
+# The csv_schema.Schema of a file, inferred once per version of the file (a
+# sample costs a few seeks, but every run of every mode starts with it)
+def get_schema(filename):
+    key = file_fingerprint(filename)
+    with schemas_lock:
+        schema = schemas.get(key)
+        if schema is not None:
+            schemas.move_to_end(key)
+            return schema
+    schema = read_columnar_schema(filename) if columnar_format(filename) is not None else read_schema(filename)
+    with schemas_lock:
+        schemas[key] = schema
+        while len(schemas) > SCHEMA_CACHE_SIZE:
+            schemas.popitem(last=False)
+    return schema
@@ -0,0 +1,174 @@
+import os
+from array import array
+
+from csv_schema import ColumnSchema, Schema
+from csv_stats import ISO_DATE_FORMAT
+from csv_table import NumericColumn, Table, TextColumn
+
+# Columnar input files, told apart by extension. They are read with pyarrow,
+# which is only needed (and only imported) once such a file is opened.
+COLUMNAR_FORMATS = {'.parquet': 'parquet', '.pq': 'parquet', '.feather': 'feather', '.arrow': 'feather', '.ipc': 'feather'}
+
+# For the GUI's file dialog
+FILE_TYPES = (("CSV files", "*.csv"), ("Parquet files", "*.parquet *.pq"), ("Feather / Arrow IPC files", "*.feather *.arrow *.ipc"), ("all files", "*.*"))
+
+# Timestamps are shown, and parsed as dates, in this form
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class ColumnarError(ValueError):
+    pass
+
+
+# 'parquet' or 'feather' (Feather v2 is the Arrow IPC file format), or None for CSV
+def columnar_format(filename):
+    return COLUMNAR_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.feather
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ColumnarError("Reading Parquet, Feather and Arrow files needs pyarrow (pip install pyarrow).")
+    return pyarrow
+
+
+def arrow_schema(pa, filename, file_format):
+    if file_format == 'parquet':
+        return pa.parquet.read_schema(filename, memory_map=True)
+    with pa.memory_map(filename) as source:
+        return pa.ipc.open_file(source).schema
+
+
+# The csv_schema.Schema of a columnar file, from its own column types: nothing
+# is sampled. Numbers (integers, floats, decimals) are numeric, dates and
+# timestamps are dates, everything else is text.
+def read_columnar_schema(filename):
+    pa = import_pyarrow()
+    try:
+        schema = arrow_schema(pa, filename, columnar_format(filename))
+    except pa.ArrowException as e:
+        raise ColumnarError(f"Could not read '{filename}': {e}")
+    columns = []
+    for field in schema:
+        kind, date_format = 'text', None
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type) or pa.types.is_decimal(field.type):
+            kind = 'numeric'
+        elif pa.types.is_date(field.type):
+            kind, date_format = 'date', ISO_DATE_FORMAT
+        elif pa.types.is_timestamp(field.type):
+            kind, date_format = 'date', TIMESTAMP_FORMAT
+        columns.append(ColumnSchema(field.name, kind, 0.0, date_format))
+    return Schema(schema.names, columns, 0)
+
+
+# {column name: (min, max)} of the numeric columns of one Parquet row group
+# that have statistics
+def row_group_bounds(row_group):
+    bounds = {}
+    for i in range(row_group.num_columns):
+        chunk = row_group.column(i)
+        statistics = chunk.statistics
+        if statistics is None or not statistics.has_min_max:
+            continue
+        low, high = statistics.min, statistics.max
+        if isinstance(low, (int, float)) and isinstance(high, (int, float)) and not isinstance(low, bool):
+            bounds[chunk.path_in_schema] = (low, high)
+    return bounds
+
+
+# The bytes of a fixed-width array without nulls, as stored
+def array_bytes(chunk, width):
+    if not len(chunk):
+        return b''
+    return memoryview(chunk.buffers()[1])[chunk.offset * width:(chunk.offset + len(chunk)) * width]
+
+
+def numeric_column(pa, name, data):
+    column = NumericColumn(name)
+    values = pa.compute.fill_null(data.cast(pa.float64(), safe=False), 0.0)
+    valid = data.is_valid().cast(pa.uint8())
+    for chunk in values.chunks:
+        column.values.frombytes(array_bytes(chunk, 8))
+    for chunk in valid.chunks:
+        column.valid += array_bytes(chunk, 1)
+    column.invalid = data.null_count
+    return column
+
+
+# Arrow's own dictionary encoding gives the codes and categories a TextColumn keeps
+def text_column(pa, name, data, date_format=None):
+    column = TextColumn(name, date_format)
+    if pa.types.is_timestamp(data.type):
+        data = data.cast(pa.timestamp('s'), safe=False)
+    try:
+        text = data.cast(pa.string())
+    except pa.ArrowException:
+        # Nested types have no cast to text
+        text = pa.chunked_array([[None if value is None else str(value) for value in data.to_pylist()]], pa.string())
+    encoded = pa.compute.fill_null(text, '').combine_chunks().dictionary_encode()
+    code_type = pa.int64() if column.codes.itemsize == 8 else pa.int32()
+    indices = encoded.indices.cast(code_type)
+    column.codes.frombytes(array_bytes(indices, column.codes.itemsize))
+    column.categories = encoded.dictionary.to_pylist()
+    column.lookup = {text: code for code, text in enumerate(column.categories)}
+    return column
+
+
+# A csv_table.Table of only `columns` (names, in any order) of a columnar file.
+# may_match(bounds) is asked about every Parquet row group with the min/max
+# of its numeric columns (see row_group_bounds); groups it rules out are not
+# read at all, and the table then keeps the file row number of each row.
+def read_columnar_table(filename, columns, schema, may_match=None, progress=None):
+    pa = import_pyarrow()
+    columns = [name for name in schema.header if name in columns]
+    file_format = columnar_format(filename)
+    size = os.path.getsize(filename)
+    if progress is not None:
+        progress.start(size)
+
+    file_rows = None
+    try:
+        if file_format == 'parquet':
+            parquet_file = pa.parquet.ParquetFile(filename, memory_map=True)
+            metadata = parquet_file.metadata
+            pieces = []
+            kept = []
+            first_row = 0
+            for i in range(metadata.num_row_groups):
+                row_group = metadata.row_group(i)
+                if may_match is None or may_match(row_group_bounds(row_group)):
+                    pieces.append(parquet_file.read_row_group(i, columns=columns))
+                    kept.append((first_row, row_group.num_rows))
+                    if progress is not None:
+                        progress.update(size * (i + 1) // metadata.num_row_groups)
+                first_row += row_group.num_rows
+            if len(kept) < metadata.num_row_groups:
+                file_rows = array('l')
+                for start, count in kept:
+                    file_rows.extend(range(start, start + count))
+            if pieces:
+                data = pa.concat_tables(pieces)
+            else:
+                data = parquet_file.schema_arrow.empty_table().select(columns)
+        else:
+            data = pa.feather.read_table(filename, columns=columns, memory_map=True)
+            if progress is not None:
+                progress.update(size)
+
+        table_columns = {}
+        for name in columns:
+            column_schema = schema.column(name)
+            if column_schema.kind == 'numeric':
+                table_columns[name] = numeric_column(pa, name, data.column(name))
+            else:
+                table_columns[name] = text_column(pa, name, data.column(name), column_schema.date_format)
+    except pa.ArrowException as e:
+        raise ColumnarError(f"Could not read '{filename}': {e}")
+
+    projected = Schema(columns, [schema.column(name) for name in columns], 0)
+    return Table(columns, table_columns, data.num_rows, schema=projected, file_rows=file_rows)
@@ -0,0 +1,572 @@
+import argparse
+import contextlib
+import copy
+import csv
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from csv_cache import get_columnar_table, get_schema, get_table
+from csv_columnar import ColumnarError, columnar_format
+from csv_filter import FilterError, compile_filter
+from csv_index import FileView, load_index, save_index
+from csv_jobs import JobCancelled
+from csv_parallel import analyze_chunk, analyze_parallel
+from csv_profile import profiler
+from csv_reader import MappedCSV
+from csv_stats import ISO_DATE_FORMAT, Diagnostics, is_blank, to_number
+from csv_table import TableView, reader_end
+
+# The analysis behind the GUI's "Analyze CSV" and "Visualize Data" buttons.
+# Nothing here imports tkinter or matplotlib, so it can be used headless and
+# from the GUI's worker thread alike.
+
+
+# What one analysis found: statistics per numerical column (by column
+# index), the date range if a date column was given, statistics per group
+# (group key -> csv_stats.GroupStats) if a group-by column was given, a
+# view of the matching rows for the data grid and the csv_stats.Diagnostics
+# of the cells that had to be skipped.
+class AnalysisResult:
+    def __init__(self, filename, header, numerical_columns, column_stats, row_count, date_column=None, date_index=None, date_stats=None, view=None, group_column=None, groups=None,
+                 diagnostics=None):
+        self.filename = filename
+        self.header = header
+        self.numerical_columns = numerical_columns
+        self.column_stats = column_stats
+        self.row_count = row_count
+        self.date_column = date_column
+        self.date_index = date_index
+        self.date_stats = date_stats
+        self.view = view
+        self.group_column = group_column
+        self.groups = groups
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics()
+
+
+# Aggregates of the last incremental 'stream'/'parallel' run over each file:
+# absolute path -> (analysis parameters, bytes read, prefix check, StreamingAnalysis)
+stream_states = {}
+
+
+# The streaming modes. With incremental=True and a previous run over the same
+# file with the same parameters, only the bytes appended since then are
+# parsed and folded into a copy of the earlier aggregates; if the file was
+# truncated or rewritten the prefix check fails and everything is read again.
+# A scan of the whole file also builds the file's row index if it has none.
+def stream_analysis(filename, header, numerical_columns, filter_index, filter_value, filter_numeric, date_index, mode, incremental=False, progress=None, expression=None, group_index=None, group_numeric=False,
+                    date_format=ISO_DATE_FORMAT, histogram_ranges=None):
+    path = os.path.abspath(filename)
+    parameters = (header, numerical_columns, filter_index, filter_value, filter_numeric, date_index, expression, group_index, group_numeric, date_format, histogram_ranges)
+    with MappedCSV(filename) as reader:
+        # Only read up to the size seen now, even if the file grows meanwhile
+        start = None
+        end = reader.size
+        previous = None
+        state = stream_states.get(path) if incremental else None
+        if state is not None:
+            old_parameters, old_end, old_check, old_analysis = state
+            if old_parameters == parameters and old_end <= end and reader.prefix_check(old_end) == old_check:
+                start = old_end
+                previous = old_analysis
+        new_end, new_check = reader_end(reader)
+        file_header = reader.header
+    index = start is None and load_index(filename) is None
+
+    if mode == 'parallel':
+        analysis = analyze_parallel(filename, header, numerical_columns, filter_index, filter_value, filter_numeric, date_index, progress=progress, start=start, end=end,
+                                    expression=expression, group_index=group_index, group_numeric=group_numeric, date_format=date_format, histogram_ranges=histogram_ranges,
+                                    index=index)
+    else:
+        analysis = analyze_chunk(filename, start, end, header, numerical_columns, filter_index, filter_value, filter_numeric, date_index, expression, group_index, group_numeric,
+                                 date_format, histogram_ranges, index)
+    rows_parsed = analysis.rows_read
+    if index:
+        save_index(filename, end, file_header, analysis.rows_read, analysis.index_offsets, analysis.index_rows)
+        analysis.index_rows = analysis.index_offsets = None
+    if previous is not None:
+        # The stored aggregates may belong to an earlier result, so they are not changed in place
+        analysis = copy.deepcopy(previous).merge(analysis)
+
+    if incremental:
+        if new_end is None:
+            stream_states.pop(path, None)
+        else:
+            stream_states[path] = (parameters, new_end, new_check, analysis)
+    return analysis, rows_parsed
+
+
+# mode is one of:
+#   'table'    - parse into typed column buffers (cached), needed for sorting and the data grid
+#   'parallel' - stream the file on worker processes that only send back aggregates
+#   'stream'   - one constant-memory pass in this process, nothing is kept
+# incremental=True is for append-only files (logs): a re-run only parses the
+# rows added since the previous run, see TableCache.get_table and stream_analysis.
+# filter_expression is a csv_filter expression such as "Age > 30 and City in (Chicago, Houston)";
+# it applies together with the filter_column = filter_value filter.
+# group_column adds the statistics of each distinct value of that column.
+# Parquet, Feather and Arrow IPC files are always analyzed as a table, of only
+# the columns the analysis uses (see TableCache.get_columnar_table).
+def analyze(filename, filter_column='', filter_value='', sort_column='', date_column='', selected_columns=(), mode='table', progress=None, incremental=False, filter_expression='', group_column=''):
+    # CSV Analysis Logic
+    columnar = columnar_format(filename) is not None
+    if columnar:
+        mode = 'table'
+    try:
+        # Column types come from a sample of the whole file, see csv_schema;
+        # a columnar file's come from the file, which is read once the columns are known
+        if mode != 'table' or columnar:
+            table = None
+            with profiler.span("read schema"):
+                schema = get_schema(filename)
+            header = schema.header
+            numeric_flags = schema.numeric_flags()
+        else:
+            # Served from the table cache when the file hasn't changed since the last run
+            with profiler.span("load") as span:
+                table = get_table(filename, progress, incremental)
+                span.rows = table.row_count
+            schema = table.schema
+            header = table.header
+            numeric_flags = [table.column(name).kind == 'numeric' for name in header]
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.\n")
+        return None
+    except ColumnarError as e:
+        print(f"Error: {e}\n")
+        return None
+
+    filter_index = None
+    if filter_column and filter_value:
+        if filter_column not in header:
+            print(f"Error: Column '{filter_column}' not found.\n")
+            return None
+        filter_index = header.index(filter_column)
+
+    expression = None
+    if filter_expression.strip():
+        try:
+            expression = compile_filter(filter_expression, header, numeric_flags, [column.date_format for column in schema.columns])
+        except FilterError as e:
+            print(f"Error: Invalid filter expression. {e}\n")
+            return None
+
+    if sort_column and sort_column not in header:
+        print(f"Error: Column '{sort_column}' not found.\n")
+        return None
+
+    date_index = None
+    date_format = ISO_DATE_FORMAT
+    if date_column:
+        if date_column in header:
+            date_index = header.index(date_column)
+            date_format = schema.date_format(date_column)
+        else:
+            print(f"Error: Column '{date_column}' not found.\n")
+
+    group_index = None
+    if group_column:
+        if group_column not in header:
+            print(f"Error: Column '{group_column}' not found.\n")
+            return None
+        group_index = header.index(group_column)
+
+    for column in selected_columns:
+        if column not in header:
+            print(f"Error: Column '{column}' not found.\n")
+            return None
+
+    # Determine numerical columns
+    numerical_columns = [header.index(column) for column in selected_columns if numeric_flags[header.index(column)]]
+
+    if not numerical_columns:
+        print("No numerical columns found in the file.\n")
+        return None
+
+    if mode != 'table':
+        # Statistics don't depend on row order, so there is nothing to sort here
+        filter_numeric = filter_index is not None and numeric_flags[filter_index]
+        group_numeric = group_index is not None and numeric_flags[group_index]
+        try:
+            with profiler.span(f"{mode} parse + statistics") as span:
+                analysis, span.rows = stream_analysis(filename, header, numerical_columns, filter_index, filter_value, filter_numeric, date_index, mode,
+                                                      incremental, progress, expression, group_index, group_numeric, date_format)
+        except ValueError as e:
+            print(f"Error: {e}\n")
+            return None
+        row_count = analysis.rows_matched
+        column_stats = analysis.column_stats
+        date_stats = analysis.date_stats
+        groups = analysis.groups
+        diagnostics = analysis.diagnostics
+        # Workers keep no rows, so the grid can only show the file as it is on disk
+        index = load_index(filename)
+        view = FileView(filename, index) if index is not None and filter_index is None and expression is None and not sort_column else None
+    else:
+        if table is None:
+            # Just the columns read below; Parquet row groups the filters rule out are skipped
+            used = set(numerical_columns)
+            for name in (filter_column if filter_index is not None else None, sort_column, date_column if date_index is not None else None, group_column):
+                if name:
+                    used.add(header.index(name))
+            if expression is not None:
+                used.update(expression.column_indices())
+            try:
+                with profiler.span("load") as span:
+                    table = get_columnar_table(filename, [header[i] for i in sorted(used)], expression, filter_column if filter_index is not None else None, filter_value, progress)
+                    span.rows = table.row_count
+            except ColumnarError as e:
+                print(f"Error: {e}\n")
+                return None
+
+        # Filtering data
+        rows = None
+        if filter_index is not None:
+            with profiler.span("filter", table.row_count):
+                rows = table.filter_rows(filter_column, filter_value)
+        if expression is not None:
+            with profiler.span("filter expression", table.row_count if rows is None else len(rows)):
+                rows = expression.filter_rows(table, rows)
+
+        # Sorting data: only the data grid shows the order, so the view sorts
+        # when (and as far as) it is scrolled; statistics don't need it
+        row_count = table.row_count if rows is None else len(rows)
+        view = TableView(table, rows, sort_column or None)
+        diagnostics = Diagnostics()
+        column_stats = {}
+        for i in numerical_columns:
+            if progress is not None and progress.cancelled():
+                raise JobCancelled()
+            with profiler.span(f"statistics '{header[i]}'", row_count):
+                column_stats[i] = table.column_stats(header[i], rows, diagnostics)
+        date_stats = None
+        if date_index is not None:
+            with profiler.span(f"dates '{date_column}'", row_count):
+                date_stats = table.date_stats(date_column, rows, date_format, diagnostics)
+        groups = None
+        if group_index is not None:
+            with profiler.span(f"group by '{group_column}'", row_count):
+                try:
+                    groups = table.group_stats(group_column, {i: header[i] for i in numerical_columns}, rows)
+                except ValueError as e:
+                    print(f"Error: {e}\n")
+                    return None
+
+    # One line per column and kind of problem, however many rows had it
+    for line in diagnostics.summary_lines():
+        print(f"Warning: {line}\n")
+    for i in numerical_columns:
+        if column_stats[i].count == 0:
+            print(f"Warning: Column '{header[i]}' contains no numerical data after error handling.\n")
+    if date_stats is not None and not date_stats.count:
+        print(f"Warning: No valid dates for analysis in column '{date_column}'.\n")
+
+    return AnalysisResult(filename, header, numerical_columns, column_stats, row_count, date_column, date_index, date_stats, view, group_column or None, groups, diagnostics)
+
+
+# One results tree row for a column's statistics
+def stats_values(label, stats):
+    average = stats.average()
+    minimum = stats.minimum
+    maximum = stats.maximum
+    median = stats.median()
+    mode = stats.mode()
+    std_dev = stats.stdev()
+    if std_dev is None:
+        std_dev = "N/A"
+    if stats.approximate:
+        # Too many distinct values to count exactly, these came from the sketches
+        median = f"{median} (approx.)"
+        mode = f"{mode} (approx.)"
+    return (label, average, minimum, maximum, median, mode, std_dev)
+
+
+# Group keys in display order: numbers by value, then text, then blanks
+def ordered_group_keys(groups):
+    def key(text):
+        number = to_number(text)
+        if number is not None and math.isnan(number):
+            number = None
+        return (is_blank(text), number is None, number if number is not None else 0.0, text)
+    return sorted(groups, key=key)
+
+
+# The rows of the GUI's results tree, as (values, tag) pairs, or
+# (values, tag, child rows) for a group that can be expanded
+def result_rows(result):
+    header = result.header
+    rows = []
+
+    # Calculate statistics for numerical columns
+    for i in result.numerical_columns:
+        stats = result.column_stats[i]
+        if stats.count == 0:
+            continue
+
+        # Add header row for column statistics
+        rows.append(((f"Statistics for column '{header[i]}'", "", "", "", "", "", ""), 'header'))
+
+        # Add data row with alternating background colors
+        rows.append((stats_values("", stats), 'even' if i % 2 == 0 else 'odd'))
+
+    # Group-by (if a group column is specified): one collapsed row per group
+    if result.groups is not None:
+        rows.append(((f"Statistics by '{result.group_column}' ({len(result.groups)} groups)", "", "", "", "", "", ""), 'header'))
+        for key in ordered_group_keys(result.groups):
+            group = result.groups[key]
+            children = [(stats_values(header[i], group.column_stats[i]), 'even' if i % 2 == 0 else 'odd')
+                        for i in result.numerical_columns if group.column_stats[i].count]
+            label = key if not is_blank(key) else "(blank)"
+            rows.append(((f"{result.group_column} = {label}", f"{group.rows} rows", "", "", "", "", ""), 'group', children))
+
+    # Date handling (if date column is specified)
+    date_stats = result.date_stats
+    if date_stats is not None and date_stats.count:
+        oldest_date = date_stats.oldest
+        newest_date = date_stats.newest
+
+        # Add header row for date analysis
+        rows.append(((f"Date Analysis for column '{result.date_column}'", "", "", "", "", "", ""), 'header'))
+
+        # Add data row with alternating background colors
+        rows.append((("", f"Oldest Date = {oldest_date}",  f"Newest Date = {newest_date}", "", "", "", ""), 'even' if result.date_index % 2 == 0 else 'odd'))
+
+    return rows
+
+
+# Worker-thread entry point for the GUI: (results tree rows, data grid view)
+def run_analysis(filename, filter_column, filter_value, sort_column, date_column, selected_columns, parallel=False, incremental=False, filter_expression='', group_column='', progress=None):
+    result = analyze(filename, filter_column, filter_value, sort_column, date_column, selected_columns, 'parallel' if parallel else 'table', progress,
+                     incremental, filter_expression, group_column)
+    if result is None:
+        return None
+    with profiler.span("format results"):
+        rows = result_rows(result)
+    # The grid's first screens are sorted here rather than on the Tk thread
+    if isinstance(result.view, TableView):
+        result.view.prefetch()
+    return rows, result.view, result.diagnostics
+
+
+# (column, csv_stats.Histogram) for each selected numeric column. The
+# histograms hold counts per bin, so what is handed to matplotlib doesn't
+# grow with the file. With parallel=True they are binned during a streaming
+# pass on worker processes, starting from the schema's sampled range;
+# otherwise from the cached table, after a min/max pass.
+def load_plot_data(filename, selected_columns, parallel=False, progress=None):
+    # A columnar file is read as a table of just the plotted columns
+    columnar = columnar_format(filename) is not None
+    try:
+        if parallel or columnar:
+            table = None
+            with profiler.span("read schema"):
+                schema = get_schema(filename)
+            header = schema.header
+            numeric_flags = schema.numeric_flags()
+        else:
+            with profiler.span("load") as span:
+                table = get_table(filename, progress)
+                span.rows = table.row_count
+            header = table.header
+            numeric_flags = [table.column(name).kind == 'numeric' for name in header]
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.\n")
+        return None
+    except ColumnarError as e:
+        print(f"Error: {e}\n")
+        return None
+
+    columns = []
+    for column in selected_columns:
+        if column not in header:
+            print(f"Error: Column '{column}' not found.\n")
+        elif not numeric_flags[header.index(column)]:
+            print(f"Warning: Column '{column}' contains non-numerical data and cannot be visualized.\n")
+        else:
+            columns.append(column)
+
+    if columnar and columns:
+        try:
+            with profiler.span("load") as span:
+                table = get_columnar_table(filename, columns, progress=progress)
+                span.rows = table.row_count
+        except ColumnarError as e:
+            print(f"Error: {e}\n")
+            return None
+
+    histograms = {}
+    if table is not None:
+        for column in columns:
+            with profiler.span(f"plot data '{column}'", table.row_count):
+                histograms[column] = table.histogram(column)
+    elif columns:
+        indices = [header.index(column) for column in columns]
+        ranges = {}
+        for i in indices:
+            column_schema = schema.columns[i]
+            low = column_schema.minimum if column_schema.minimum is not None else 0.0
+            ranges[i] = (low, column_schema.maximum if column_schema.maximum is not None else low)
+        with profiler.span("parallel histograms") as span:
+            analysis, span.rows = stream_analysis(filename, header, indices, None, None, False, None, 'parallel', progress=progress, histogram_ranges=ranges)
+        for i in indices:
+            histogram = analysis.histograms[i]
+            histograms[header[i]] = histogram if histogram.total() else None
+
+    plot_data = []
+    for column in columns:
+        if histograms[column] is None:
+            print(f"Warning: Column '{column}' contains no numerical data after error handling.\n")
+            continue
+        plot_data.append((column, histograms[column]))
+    return plot_data
+
+
+# JSON has no NaN or Infinity (a column of inf values, or a sum that
+# overflowed, gives them), so they are written as null
+def finite(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+# Plain-data summary of a result, for JSON/CSV output
+def summarize_columns(header, numerical_columns, column_stats):
+    columns = {}
+    for i in numerical_columns:
+        stats = column_stats[i]
+        if stats.count == 0:
+            continue
+        columns[header[i]] = {
+            'count': stats.count,
+            'average': finite(stats.average()),
+            'minimum': finite(stats.minimum),
+            'maximum': finite(stats.maximum),
+            'median': finite(stats.median()),
+            'mode': finite(stats.mode()),
+            'std_dev': finite(stats.stdev()),
+            'approximate': stats.approximate,
+        }
+    return columns
+
+
+def summarize(result):
+    columns = summarize_columns(result.header, result.numerical_columns, result.column_stats)
+    summary = {'file': result.filename, 'rows': result.row_count, 'columns': columns}
+    date_stats = result.date_stats
+    if date_stats is not None:
+        summary['dates'] = {
+            'column': result.date_column,
+            'oldest': date_stats.oldest.date().isoformat() if date_stats.count else None,
+            'newest': date_stats.newest.date().isoformat() if date_stats.count else None,
+            'count': date_stats.count,
+            'missing': date_stats.missing,
+            'invalid': date_stats.invalid,
+        }
+    if result.groups is not None:
+        summary['group_column'] = result.group_column
+        summary['groups'] = {
+            key: {'rows': result.groups[key].rows,
+                  'columns': summarize_columns(result.header, result.numerical_columns, result.groups[key].column_stats)}
+            for key in ordered_group_keys(result.groups)
+        }
+    summary['warnings'] = [{'column': column, 'problem': problem, 'count': count, 'rows': rows}
+                           for column, problem, count, rows in result.diagnostics.entries()]
+    return summary
+
+
+# One file of a batch run. Messages go to stderr so they never mix with the output.
+def analyze_file(filename, options):
+    with contextlib.redirect_stdout(sys.stderr), profiler.span(f"analyze {filename}"):
+        try:
+            result = analyze(filename, options['filter_column'], options['filter_value'], options['sort_column'],
+                             options['date_column'], options['columns'], options['mode'], filter_expression=options['filter_expression'],
+                             group_column=options['group_column'])
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}\n")
+            result = None
+    if result is None:
+        return {'file': filename, 'error': 'analysis failed, see messages above'}
+    if options.get('log') and result.diagnostics.total():
+        result.diagnostics.write_log(options['log'], filename)
+    return summarize(result)
+
+
+CSV_FIELDS = ['file', 'group', 'column', 'count', 'average', 'minimum', 'maximum', 'median', 'mode', 'std_dev', 'approximate', 'oldest_date', 'newest_date', 'error']
+
+
+def write_csv(summaries, output):
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for summary in summaries:
+        if 'error' in summary:
+            writer.writerow({'file': summary['file'], 'error': summary['error']})
+            continue
+        for column, stats in summary['columns'].items():
+            writer.writerow(dict(stats, file=summary['file'], column=column))
+        dates = summary.get('dates')
+        if dates is not None:
+            writer.writerow({'file': summary['file'], 'column': dates['column'], 'count': dates['count'],
+                             'oldest_date': dates['oldest'], 'newest_date': dates['newest']})
+        for key, group in summary.get('groups', {}).items():
+            for column, stats in group['columns'].items():
+                writer.writerow(dict(stats, file=summary['file'], group=f"{summary['group_column']}={key}", column=column))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the CSV Analyzer column statistics for one or more files without a display.")
+    parser.add_argument("files", nargs="+", help="CSV, Parquet, Feather or Arrow IPC files to analyze")
+    parser.add_argument("-c", "--columns", nargs="+", required=True, help="columns to compute statistics for")
+    parser.add_argument("--filter-column", default="", help="only keep rows where this column ...")
+    parser.add_argument("--filter-value", default="", help="... equals this value")
+    parser.add_argument("--filter", default="", help='filter expression, e.g. "Age > 30 and City in (Chicago, Houston)"')
+    parser.add_argument("--group-by", default="", help="also compute the statistics for each distinct value of this column")
+    parser.add_argument("--sort-column", default="", help="sort column (statistics do not depend on order)")
+    parser.add_argument("--date-column", default="", help="report the oldest and newest date in this column")
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("-o", "--output", help="write here instead of stdout")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of files analyzed at the same time")
+    parser.add_argument("--parallel", action="store_true", help="also split each file across all cores")
+    parser.add_argument("--trace", help="write per-stage timings here as a Chrome trace (files analyzed with -j 1 only)")
+    parser.add_argument("--log", help="append a summary of the skipped cells of each file to this file")
+    args = parser.parse_args(argv)
+
+    options = {
+        'filter_column': args.filter_column,
+        'filter_value': args.filter_value,
+        'filter_expression': args.filter,
+        'group_column': args.group_by,
+        'sort_column': args.sort_column,
+        'date_column': args.date_column,
+        'columns': args.columns,
+        'log': args.log,
+        # Batch runs stream the files; nothing needs the rows afterwards
+        'mode': 'parallel' if args.parallel else 'stream',
+    }
+
+    if args.jobs > 1 and len(args.files) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            summaries = list(executor.map(analyze_file, args.files, [options] * len(args.files)))
+    else:
+        summaries = [analyze_file(filename, options) for filename in args.files]
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump(summaries, output, indent=2, allow_nan=False)
+            output.write("\n")
+        else:
+            write_csv(summaries, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if args.trace:
+        profiler.save_trace(args.trace)
+
+    return 1 if any('error' in summary for summary in summaries) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
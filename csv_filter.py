@@ -0,0 +1,577 @@
+import re
+from array import array
+from itertools import compress
+
+from csv_stats import ISO_DATE_FORMAT, cell, is_blank, number_text, parse_day, to_number
+
+# Filter expressions, e.g.
+#     Age > 30 and City in ("Chicago", "Houston")
+#     Salary between 40000 and 60000 or Name matches "^A"
+#     Date >= 2020-01-01 and not Salary is null
+# Conditions: = (or ==), !=, <, <=, >, >=, [not] in (...), [not] between .. and ..,
+# is [not] null, [not] matches "regex" (or ~), combined with and / or / not and
+# parentheses. Column names with spaces go in `backticks`, text values in quotes
+# (a single word needs none). A blank cell, or one that isn't a number in a
+# numeric column, is null and only matches "is null". A YYYY-MM-DD value
+# compares as a date, and only with cells that are dates; cells are read as
+# dates in the format the schema found for their column (ISO by default), and
+# a value may also be written in that format.
+#
+# An expression is compiled once into a tree of conditions. Over a parsed
+# table it is evaluated a whole column at a time into a mask (a bytearray with
+# a 0 or 1 per row): numeric conditions map a bound float method over the
+# column's array, text conditions test each distinct string once and look the
+# codes up, and and/or/not combine masks as big integers. A date range on a
+# text column is answered from the table's DateIndex by binary search when
+# that picks out few rows. Over streamed rows the same tree gives a per-row test.
+# Given the min/max of a block of rows (a Parquet row group) it can also tell
+# when no row of the block can match, so the block need not be read.
+
+
+class FilterError(ValueError):
+    pass
+
+
+TOKEN = re.compile(r'''\s*(?:
+    (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<name>`[^`]*`)
+  | (?P<op><=|>=|!=|==|=|<|>|~|\(|\)|\[|\]|,)
+  | (?P<word>[^\s()\[\],=<>!~"'`]+)
+)''', re.VERBOSE)
+
+# Flips every byte of a mask
+INVERT = bytes.maketrans(b'\x00\x01', b'\x01\x00')
+
+# A date range is looked up in the DateIndex only when it holds at most this
+# fraction of the rows; sorting more row numbers back into file order costs
+# more than scanning the column
+INDEX_MAX_FRACTION = 0.1
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN.match(text, pos)
+        if match is None or match.end() == pos:
+            raise FilterError(f"Unexpected character {text[pos:].lstrip()[:1]!r} at position {pos + 1}.")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'string':
+            quote = value[0]
+            value = value[1:-1].replace('\\' + quote, quote)
+        elif kind == 'name':
+            value = value[1:-1]
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+def mask_and(a, b):
+    return bytearray((int.from_bytes(a, 'little') & int.from_bytes(b, 'little')).to_bytes(len(a), 'little'))
+
+
+def mask_or(a, b):
+    return bytearray((int.from_bytes(a, 'little') | int.from_bytes(b, 'little')).to_bytes(len(a), 'little'))
+
+
+def mask_not(a):
+    return a.translate(INVERT)
+
+
+# A literal from the expression: its text, its value if it is a number and
+# its day number if it is a date
+class Literal:
+    def __init__(self, text, quoted):
+        self.text = text
+        self.number = None if quoted else to_number(text)
+        self.day = parse_day(text) if self.number is None else None
+
+
+# One test on one column. Subclasses give test_number(float) for numeric
+# columns and test_text(str) for text columns; number_mask can be overridden
+# with something faster than calling test_number per value. date_format is
+# the format the column's dates are written in.
+class Condition:
+    def __init__(self, column, index, numeric, date_format=ISO_DATE_FORMAT):
+        self.column = column
+        self.index = index
+        self.numeric = numeric
+        self.date_format = date_format
+
+    # Day number of a literal: ISO, or else in the column's date format
+    def literal_day(self, literal):
+        if literal.day is not None or literal.number is not None or self.date_format == ISO_DATE_FORMAT:
+            return literal.day
+        return parse_day(literal.text, self.date_format)
+
+    def cell_day(self, text):
+        return parse_day(text, self.date_format)
+
+    def column_indices(self):
+        return {self.index}
+
+    def number_mask(self, values):
+        return bytearray(map(self.test_number, values))
+
+    def mask(self, table):
+        column = table.column(self.column)
+        if column.kind == 'numeric':
+            return mask_and(self.number_mask(column.values), column.valid)
+        hits = bytearray(0 if is_blank(text) else bool(self.test_text(text)) for text in column.categories)
+        return bytearray(map(hits.__getitem__, column.codes))
+
+    def row_test(self, position):
+        pos = position[self.index]
+        if self.numeric:
+            test_number = self.test_number
+
+            def test(row):
+                try:
+                    return test_number(float(cell(row, pos)))
+                except ValueError:
+                    return False
+        else:
+            test_text = self.test_text
+
+            def test(row):
+                text = cell(row, pos)
+                return not is_blank(text) and test_text(text)
+        return test
+
+    def number_literal(self, literal):
+        if literal.number is None:
+            raise FilterError(f"Column '{self.column}' is numeric, '{literal.text}' is not a number.")
+        return literal.number
+
+    # Matching row numbers in file order from an index, or None to use mask()
+    def index_rows(self, table):
+        return None
+
+    # False when no row of a block whose numeric columns lie within bounds
+    # ({column name: (min, max)}) can match; True when unsure
+    def may_match(self, bounds):
+        return True
+
+    # (min, max) of this numeric column in the block, or None if not known
+    def number_bounds(self, bounds):
+        return bounds.get(self.column) if self.numeric else None
+
+    # Rows of a date column from low to high day (None for no bound) by the
+    # table's DateIndex, or None when there is none or the range is too wide
+    def date_range_rows(self, table, low, high, low_inclusive=True, high_inclusive=True):
+        index = table.date_index(self.column)
+        if index is None:
+            return None
+        start, end = index.range_bounds(low, high, low_inclusive, high_inclusive)
+        if end - start > table.row_count * INDEX_MAX_FRACTION:
+            return None
+        return index.file_order(start, end)
+
+
+# Bound methods of the literal that answer "cell <op> literal" when called with the cell's value
+REVERSED = {'=': '__eq__', '==': '__eq__', '!=': '__ne__', '<': '__gt__', '<=': '__ge__', '>': '__lt__', '>=': '__le__'}
+
+
+# (low, high, low inclusive, high inclusive) of "cell <op> day"
+DAY_RANGES = {
+    '=': lambda day: (day, day, True, True),
+    '==': lambda day: (day, day, True, True),
+    '<': lambda day: (None, day, True, False),
+    '<=': lambda day: (None, day, True, True),
+    '>': lambda day: (day, None, False, True),
+    '>=': lambda day: (day, None, True, True),
+}
+
+
+class Comparison(Condition):
+    def __init__(self, column, index, numeric, date_format, op, literal):
+        super().__init__(column, index, numeric, date_format)
+        self.op = op
+        self.literal = literal
+        if numeric:
+            self.test_number = getattr(self.number_literal(literal), REVERSED[op])
+        self.text_test = getattr(literal.text, REVERSED[op])
+        self.text_number_test = getattr(literal.number, REVERSED[op]) if literal.number is not None else None
+        self.day = self.literal_day(literal)
+        self.day_test = getattr(self.day, REVERSED[op]) if self.day is not None else None
+
+    def index_rows(self, table):
+        if self.numeric or self.day_test is None or self.op not in DAY_RANGES:
+            return None
+        return self.date_range_rows(table, *DAY_RANGES[self.op](self.day))
+
+    # != is left out: NaN cells differ from every number
+    def may_match(self, bounds):
+        block = self.number_bounds(bounds)
+        if block is None or self.op == '!=':
+            return True
+        low, high = block
+        value = self.literal.number
+        if self.op in ('=', '=='):
+            return low <= value <= high
+        if self.op in ('<', '<='):
+            return self.test_number(low)
+        return self.test_number(high)
+
+    # In a text column a number compares as a number with cells that are
+    # numbers, and a date as a date with cells that are dates
+    def test_text(self, text):
+        if self.day_test is not None:
+            day = self.cell_day(text)
+            return day is not None and self.day_test(day)
+        if self.text_number_test is not None:
+            number = to_number(text)
+            if number is not None:
+                return self.text_number_test(number)
+        return self.text_test(text)
+
+
+class Membership(Condition):
+    def __init__(self, column, index, numeric, date_format, literals, negate):
+        super().__init__(column, index, numeric, date_format)
+        self.negate = negate
+        if numeric:
+            self.numbers = {self.number_literal(literal) for literal in literals}
+        self.texts = {literal.text for literal in literals}
+        self.text_numbers = {literal.number for literal in literals if literal.number is not None}
+
+    def test_number(self, value):
+        return (value in self.numbers) != self.negate
+
+    def number_mask(self, values):
+        mask = bytearray(map(self.numbers.__contains__, values))
+        return mask_not(mask) if self.negate else mask
+
+    def may_match(self, bounds):
+        block = self.number_bounds(bounds)
+        if block is None or self.negate:
+            return True
+        low, high = block
+        return any(low <= number <= high for number in self.numbers)
+
+    def test_text(self, text):
+        found = text in self.texts
+        if not found and self.text_numbers:
+            found = to_number(text) in self.text_numbers
+        return found != self.negate
+
+
+class Between(Condition):
+    def __init__(self, column, index, numeric, date_format, low, high, negate):
+        super().__init__(column, index, numeric, date_format)
+        self.negate = negate
+        self.low = low
+        self.high = high
+        self.low_day = self.literal_day(low)
+        self.high_day = self.literal_day(high)
+        if numeric:
+            self.low_number = self.number_literal(low)
+            self.high_number = self.number_literal(high)
+
+    def test_number(self, value):
+        return (self.low_number <= value <= self.high_number) != self.negate
+
+    def number_mask(self, values):
+        mask = mask_and(bytearray(map(self.low_number.__le__, values)), bytearray(map(self.high_number.__ge__, values)))
+        return mask_not(mask) if self.negate else mask
+
+    def index_rows(self, table):
+        if self.numeric or self.negate or self.low_day is None or self.high_day is None:
+            return None
+        return self.date_range_rows(table, self.low_day, self.high_day)
+
+    def may_match(self, bounds):
+        block = self.number_bounds(bounds)
+        if block is None or self.negate:
+            return True
+        low, high = block
+        return low <= self.high_number and high >= self.low_number
+
+    def test_text(self, text):
+        low, high = self.low, self.high
+        if self.low_day is not None and self.high_day is not None:
+            day = self.cell_day(text)
+            return day is not None and (self.low_day <= day <= self.high_day) != self.negate
+        number = to_number(text) if low.number is not None and high.number is not None else None
+        if number is not None:
+            inside = low.number <= number <= high.number
+        else:
+            inside = low.text <= text <= high.text
+        return inside != self.negate
+
+
+class Matches(Condition):
+    def __init__(self, column, index, numeric, date_format, pattern, negate):
+        super().__init__(column, index, numeric, date_format)
+        self.negate = negate
+        try:
+            self.pattern = re.compile(pattern)
+        except re.error as e:
+            raise FilterError(f"Bad regular expression {pattern!r}: {e}.")
+
+    def test_number(self, value):
+        return (self.pattern.search(number_text(value)) is not None) != self.negate
+
+    def test_text(self, text):
+        return (self.pattern.search(text) is not None) != self.negate
+
+
+class IsNull(Condition):
+    def __init__(self, column, index, numeric, date_format, negate):
+        super().__init__(column, index, numeric, date_format)
+        self.negate = negate
+
+    def mask(self, table):
+        column = table.column(self.column)
+        if column.kind == 'numeric':
+            return bytearray(column.valid) if self.negate else mask_not(column.valid)
+        hits = bytearray(is_blank(text) != self.negate for text in column.categories)
+        return bytearray(map(hits.__getitem__, column.codes))
+
+    def row_test(self, position):
+        pos = position[self.index]
+        negate = self.negate
+        if self.numeric:
+            def test(row):
+                return (to_number(cell(row, pos)) is None) != negate
+        else:
+            def test(row):
+                return is_blank(cell(row, pos)) != negate
+        return test
+
+
+class And:
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    def column_indices(self):
+        return self.left.column_indices() | self.right.column_indices()
+
+    def mask(self, table):
+        return mask_and(self.left.mask(table), self.right.mask(table))
+
+    def may_match(self, bounds):
+        return self.left.may_match(bounds) and self.right.may_match(bounds)
+
+    # When one side comes from an index the other only filters its rows
+    def index_rows(self, table):
+        for indexed, other in ((self.left, self.right), (self.right, self.left)):
+            rows = indexed.index_rows(table)
+            if rows is not None:
+                mask = other.mask(table)
+                return array('l', compress(rows, map(mask.__getitem__, rows)))
+        return None
+
+    def row_test(self, position):
+        left, right = self.left.row_test(position), self.right.row_test(position)
+        return lambda row: left(row) and right(row)
+
+
+class Or(And):
+    def mask(self, table):
+        return mask_or(self.left.mask(table), self.right.mask(table))
+
+    def may_match(self, bounds):
+        return self.left.may_match(bounds) or self.right.may_match(bounds)
+
+    def index_rows(self, table):
+        return None
+
+    def row_test(self, position):
+        left, right = self.left.row_test(position), self.right.row_test(position)
+        return lambda row: left(row) or right(row)
+
+
+class Not:
+    def __init__(self, operand):
+        self.operand = operand
+
+    def column_indices(self):
+        return self.operand.column_indices()
+
+    def mask(self, table):
+        return mask_not(self.operand.mask(table))
+
+    def index_rows(self, table):
+        return None
+
+    def may_match(self, bounds):
+        return True
+
+    def row_test(self, position):
+        operand = self.operand.row_test(position)
+        return lambda row: not operand(row)
+
+
+# Recursive descent over the tokens:
+#   expression := term ("or" term)*
+#   term       := factor ("and" factor)*
+#   factor     := "not" factor | "(" expression ")" | condition
+class Parser:
+    def __init__(self, tokens, header, numeric_flags, date_formats):
+        self.tokens = tokens
+        self.pos = 0
+        self.header = header
+        self.numeric_flags = numeric_flags
+        self.date_formats = date_formats
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise FilterError("Unexpected end of expression.")
+        self.pos += 1
+        return token
+
+    def keyword(self, *words):
+        kind, value = self.peek()
+        if kind == 'word' and value.lower() in words:
+            self.pos += 1
+            return value.lower()
+        return None
+
+    def expect_keyword(self, word):
+        if self.keyword(word) is None:
+            raise FilterError(f"Expected '{word}' but found {self.describe()}.")
+
+    def expect_op(self, *ops):
+        kind, value = self.next()
+        if kind != 'op' or value not in ops:
+            raise FilterError(f"Expected {' or '.join(repr(op) for op in ops)} but found {value!r}.")
+        return value
+
+    def describe(self):
+        kind, value = self.peek()
+        return "the end of the expression" if kind is None else repr(value)
+
+    def parse(self):
+        node = self.expression()
+        if self.pos < len(self.tokens):
+            raise FilterError(f"Unexpected {self.describe()}.")
+        return node
+
+    def expression(self):
+        node = self.term()
+        while self.keyword('or'):
+            node = Or(node, self.term())
+        return node
+
+    def term(self):
+        node = self.factor()
+        while self.keyword('and'):
+            node = And(node, self.factor())
+        return node
+
+    def factor(self):
+        if self.keyword('not'):
+            return Not(self.factor())
+        if self.peek() == ('op', '('):
+            self.pos += 1
+            node = self.expression()
+            self.expect_op(')')
+            return node
+        return self.condition()
+
+    def literal(self):
+        kind, value = self.next()
+        if kind not in ('string', 'word'):
+            raise FilterError(f"Expected a value but found {value!r}.")
+        return Literal(value, kind == 'string')
+
+    def condition(self):
+        kind, name = self.next()
+        if kind not in ('word', 'name'):
+            raise FilterError(f"Expected a column name but found {name!r}.")
+        if name not in self.header:
+            raise FilterError(f"Column '{name}' not found.")
+        index = self.header.index(name)
+        column = (name, index, self.numeric_flags[index], self.date_formats[index])
+
+        if self.keyword('is'):
+            negate = self.keyword('not') is not None
+            self.expect_keyword('null')
+            return IsNull(*column, negate)
+
+        negate = self.keyword('not') is not None
+        if self.keyword('in'):
+            closing = ')' if self.expect_op('(', '[') == '(' else ']'
+            literals = [self.literal()]
+            while self.peek() == ('op', ','):
+                self.pos += 1
+                literals.append(self.literal())
+            self.expect_op(closing)
+            return Membership(*column, literals, negate)
+        if self.keyword('between'):
+            low = self.literal()
+            self.expect_keyword('and')
+            return Between(*column, low, self.literal(), negate)
+        if self.keyword('matches') or self.peek() == ('op', '~'):
+            if self.peek() == ('op', '~'):
+                self.pos += 1
+            return Matches(*column, self.literal().text, negate)
+        if negate:
+            raise FilterError(f"Expected 'in', 'between' or 'matches' after 'not' but found {self.describe()}.")
+
+        op = self.expect_op(*REVERSED)
+        return Comparison(*column, op, self.literal())
+
+
+# A compiled expression for one file layout (header, numeric column flags and
+# the date format of each column, None for ISO)
+class RowFilter:
+    def __init__(self, text, header, numeric_flags, date_formats=None):
+        self.text = text
+        self.header = list(header)
+        self.numeric_flags = list(numeric_flags)
+        self.date_formats = [date_format or ISO_DATE_FORMAT for date_format in date_formats] if date_formats is not None else [ISO_DATE_FORMAT] * len(self.header)
+        tokens = tokenize(text)
+        if not tokens:
+            raise FilterError("The expression is empty.")
+        self.root = Parser(tokens, self.header, self.numeric_flags, self.date_formats).parse()
+
+    # Worker processes get the text and compile it again
+    def __reduce__(self):
+        return (RowFilter, (self.text, self.header, self.numeric_flags, self.date_formats))
+
+    # Indices of the columns the expression reads
+    def column_indices(self):
+        return sorted(self.root.column_indices())
+
+    def mask(self, table):
+        return self.root.mask(table)
+
+    def may_match(self, bounds):
+        return self.root.may_match(bounds)
+
+    # Row numbers of a csv_table.Table that pass, out of `rows` (default: all, in file order)
+    def filter_rows(self, table, rows=None):
+        indexed = self.root.index_rows(table)
+        if indexed is not None:
+            if rows is None:
+                return indexed
+            return array('l', filter(set(indexed).__contains__, rows))
+        mask = self.mask(table)
+        if rows is None:
+            return array('l', compress(range(table.row_count), mask))
+        return array('l', compress(rows, map(mask.__getitem__, rows)))
+
+    # Per-row test for streamed rows; position maps a column index to its place in the row
+    def row_test(self, position=None):
+        if position is None:
+            position = {i: i for i in range(len(self.header))}
+        return self.root.row_test(position)
+
+    def __eq__(self, other):
+        return isinstance(other, RowFilter) and (self.text, self.header, self.numeric_flags, self.date_formats) == (other.text, other.header, other.numeric_flags, other.date_formats)
+
+    def __hash__(self):
+        return hash(self.text)
+
+
+def compile_filter(text, header, numeric_flags, date_formats=None):
+    return RowFilter(text, header, numeric_flags, date_formats)
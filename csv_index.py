@@ -0,0 +1,202 @@
+import json
+import os
+from bisect import bisect_right
+
+from csv_reader import MappedCSV
+
+# Sidecar file name is the CSV's name plus this suffix
+INDEX_SUFFIX = '.idx'
+
+# The byte offset of every INDEX_EVERY-th record is kept
+INDEX_EVERY = 1024
+
+# Sidecar files are only written next to CSV files of at least this many MB
+# (override with CSV_ANALYZER_INDEX_MIN_MB, 0 for every file); smaller files
+# are quick to scan again and keep their index in memory for the session
+DEFAULT_INDEX_MIN_MB = 64
+INDEX_MIN_BYTES = int(os.environ.get('CSV_ANALYZER_INDEX_MIN_MB', DEFAULT_INDEX_MIN_MB)) * 1024 * 1024
+
+# Set to False to never write sidecar files (e.g. read-only data directories)
+WRITE_INDEX = os.environ.get('CSV_ANALYZER_WRITE_INDEX', '1') != '0'
+
+# Indexes of this session by absolute path, written to disk or not
+memory_indexes = {}
+
+INDEX_VERSION = 1
+
+
+def index_path(filename):
+    return filename + INDEX_SUFFIX
+
+
+# Byte offsets of every `every`-th record of one version of a CSV file.
+# offsets[k] is where record k * every starts, so reaching any row costs one
+# seek plus parsing at most every - 1 records. An index put together from the
+# chunks of a parallel scan has its offsets on each chunk's own grid instead;
+# `rows` then holds the row number each offset starts.
+class RowIndex:
+    def __init__(self, size, mtime_ns, header, row_count, offsets, every=INDEX_EVERY, delimiter=',', quotechar='"', rows=None):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.header = header
+        self.row_count = row_count
+        self.offsets = offsets
+        self.every = every
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.rows = rows
+
+    def matches(self, filename):
+        stat = os.stat(filename)
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    # (byte offset to start parsing at, records to skip from there) for a row number
+    def locate(self, row):
+        if not self.offsets:
+            return self.size, 0
+        if self.rows is not None:
+            block = max(0, bisect_right(self.rows, row) - 1)
+            return self.offsets[block], row - self.rows[block]
+        block = min(row // self.every, len(self.offsets) - 1)
+        return self.offsets[block], row - block * self.every
+
+    # Record-aligned byte ranges of about chunk_bytes, straight from the offsets
+    def chunk_ranges(self, chunk_bytes):
+        ranges = []
+        if not self.offsets:
+            return ranges
+        start = self.offsets[0]
+        for offset in self.offsets[1:]:
+            if offset - start >= chunk_bytes:
+                ranges.append((start, offset))
+                start = offset
+        if start < self.size:
+            ranges.append((start, self.size))
+        return ranges
+
+    def save(self, filename):
+        data = {
+            'version': INDEX_VERSION,
+            'size': self.size,
+            'mtime_ns': self.mtime_ns,
+            'header': self.header,
+            'delimiter': self.delimiter,
+            'quotechar': self.quotechar,
+            'row_count': self.row_count,
+            'every': self.every,
+            'offsets': self.offsets,
+        }
+        if self.rows is not None:
+            data['rows'] = self.rows
+        with open(index_path(filename), 'w') as file:
+            json.dump(data, file)
+
+
+# The sidecar index as written, whether or not it still matches the file
+def read_index_file(filename):
+    try:
+        with open(index_path(filename), 'r') as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != INDEX_VERSION:
+        return None
+    return RowIndex(data['size'], data['mtime_ns'], data['header'], data['row_count'], data['offsets'],
+                    data['every'], data['delimiter'], data['quotechar'], data.get('rows'))
+
+
+# The index of a file from this session or its sidecar, or None if there is
+# none or it is out of date
+def load_index(filename):
+    index = memory_indexes.get(os.path.abspath(filename))
+    if index is None:
+        index = read_index_file(filename)
+    if index is None:
+        return None
+    try:
+        if not index.matches(filename):
+            return None
+    except OSError:
+        return None
+    return index
+
+
+# Called at the end of a full scan that collected every INDEX_EVERY-th record
+# start (or, with `rows`, the record starts of a parallel scan's chunks)
+def save_index(filename, size, header, row_count, offsets, rows=None):
+    stat = os.stat(filename)
+    if stat.st_size != size:
+        # The file changed while we were reading it
+        return None
+    index = RowIndex(size, stat.st_mtime_ns, header, row_count, offsets, rows=rows)
+    memory_indexes[os.path.abspath(filename)] = index
+    if WRITE_INDEX and size >= INDEX_MIN_BYTES:
+        try:
+            index.save(filename)
+        except OSError as e:
+            print(f"Warning: Could not write index for '{filename}'. {e}\n")
+    return index
+
+
+# After rows were appended to a file: the index of the old version (old_size
+# bytes, old_row_count rows) plus the record starts found in the new rows,
+# which lie on the INDEX_EVERY grid. Without a matching old index nothing is written.
+def extend_index(filename, old_size, old_row_count, size, header, row_count, offsets):
+    index = memory_indexes.get(os.path.abspath(filename)) or read_index_file(filename)
+    if index is None or index.every != INDEX_EVERY or index.size != old_size or index.row_count != old_row_count or index.header != header:
+        return None
+    rows = None
+    if index.rows is not None:
+        first = -(-old_row_count // INDEX_EVERY) * INDEX_EVERY
+        rows = index.rows + list(range(first, first + len(offsets) * INDEX_EVERY, INDEX_EVERY))
+    return save_index(filename, size, header, row_count, index.offsets + offsets, rows)
+
+
+def build_index(filename):
+    offsets = []
+    with MappedCSV(filename) as reader:
+        row_count = sum(1 for _ in reader.records(offsets=offsets, every=INDEX_EVERY))
+        return save_index(filename, reader.size, reader.header, row_count, offsets)
+
+
+def get_index(filename):
+    index = load_index(filename)
+    if index is None:
+        index = build_index(filename)
+    return index
+
+
+# `count` rows starting at row number `first` (0 = first row after the header)
+def read_rows(filename, first, count, columns=None, index=None):
+    if index is None:
+        index = get_index(filename)
+    with MappedCSV(filename) as reader:
+        if index is None:
+            start, skip = reader.data_start, first
+        else:
+            start, skip = index.locate(first)
+        rows = []
+        for row in reader.records(columns, start):
+            if skip:
+                skip -= 1
+                continue
+            if len(rows) >= count:
+                break
+            rows.append(row)
+        return rows
+
+
+# The rows of a file in file order, read straight from disk through the index.
+# Same interface as csv_table.TableView, for when no parsed table is at hand.
+class FileView:
+    def __init__(self, filename, index=None):
+        self.filename = filename
+        self.index = index if index is not None else get_index(filename)
+        self.header = self.index.header
+
+    def __len__(self):
+        return self.index.row_count
+
+    def window(self, start, count):
+        rows = read_rows(self.filename, start, count, index=self.index)
+        return [(start + k + 1,) + tuple(row) for k, row in enumerate(rows)]
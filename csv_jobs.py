@@ -0,0 +1,68 @@
+import threading
+
+# How many rows the parsers handle between progress reports / cancel checks
+PROGRESS_EVERY_ROWS = 4096
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# Shared between a worker and the GUI: the worker reports bytes read, the GUI
+# reads the percentage and can ask the worker to stop.
+class Progress:
+    def __init__(self):
+        self.bytes_read = 0
+        self.total_bytes = 0
+        self.cancel_event = threading.Event()
+
+    def start(self, total_bytes):
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+
+    def update(self, bytes_read):
+        self.bytes_read = bytes_read
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def percent(self):
+        if not self.total_bytes:
+            return 0.0
+        return min(100.0, 100.0 * self.bytes_read / self.total_bytes)
+
+
+# Runs target(*args, progress=...) on a daemon thread. Nothing here touches
+# Tk; the GUI polls `done` from the main loop and picks up `result`/`error`.
+class BackgroundJob:
+    def __init__(self, target, *args):
+        self.target = target
+        self.args = args
+        self.progress = Progress()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.done = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            self.result = self.target(*self.args, progress=self.progress)
+        except JobCancelled:
+            self.cancelled = True
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+
+    def cancel(self):
+        self.progress.cancel()
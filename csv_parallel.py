@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from csv_index import INDEX_EVERY, load_index
+from csv_jobs import JobCancelled
+from csv_reader import MappedCSV
+from csv_stats import ISO_DATE_FORMAT, StreamingAnalysis
+
+# Target size of one unit of work. Several chunks per core keeps every worker
+# busy until the end and caps how much of the file a worker holds at once.
+CHUNK_BYTES = 32 * 1024 * 1024
+
+# Quote counting walks the file in slices of this size
+SCAN_BYTES = 16 * 1024 * 1024
+
+
+def count_quotes(data, start, end):
+    quotes = 0
+    for pos in range(start, end, SCAN_BYTES):
+        quotes += data[pos:min(pos + SCAN_BYTES, end)].count(b'"')
+    return quotes
+
+
+# First record start at or after `pos`. A newline only ends a record when an
+# even number of quote characters has been seen since the last record start
+# (escaped "" pairs count twice, so they never flip the state); `quoted` says
+# whether `pos` itself is inside a quoted field.
+def next_record_start(data, pos, quoted):
+    while True:
+        newline = data.find(b'\n', pos)
+        if newline == -1:
+            return len(data)
+        if count_quotes(data, pos, newline) % 2:
+            quoted = not quoted
+        if not quoted:
+            return newline + 1
+        pos = newline + 1
+
+
+# Byte ranges of roughly chunk_bytes that each start and end on a record
+# boundary, after the header line. A valid sidecar index already knows where
+# records start, otherwise the file is scanned for quote-balanced newlines.
+# start and end (record boundaries) limit the ranges to part of the file.
+def chunk_ranges(filename, chunk_bytes=CHUNK_BYTES, start=None, end=None):
+    index = load_index(filename) if start is None else None
+    if index is not None:
+        ranges = index.chunk_ranges(chunk_bytes)
+        if end is not None:
+            ranges = [(range_start, min(range_end, end)) for range_start, range_end in ranges if range_start < end]
+        return ranges
+    with MappedCSV(filename) as reader:
+        data = reader.data
+        size = reader.size if end is None else min(end, reader.size)
+        start = reader.data_start if start is None else start
+        ranges = []
+        while start < size:
+            target = start + chunk_bytes
+            if target >= size:
+                ranges.append((start, size))
+                break
+            quoted = count_quotes(data, start, target) % 2 == 1
+            record_end = min(next_record_start(data, target, quoted), size)
+            ranges.append((start, record_end))
+            start = record_end
+        return ranges
+
+
+# Runs in a worker process: parse one byte range and return its partial aggregates.
+# Only the columns the analysis looks at are decoded. With index=True the
+# start of every INDEX_EVERY-th record of the range is noted too, for the row
+# index (rows counted from the start of the range).
+def analyze_chunk(filename, start, end, header, numeric_indices, filter_index, filter_value, filter_numeric, date_index, expression=None, group_index=None, group_numeric=False,
+                  date_format=ISO_DATE_FORMAT, histogram_ranges=None, index=False):
+    needed = set(numeric_indices) | {i for i in (filter_index, date_index, group_index) if i is not None}
+    if expression is not None:
+        needed.update(expression.column_indices())
+    needed = sorted(needed)
+    analysis = StreamingAnalysis(header, numeric_indices, filter_index, filter_value, filter_numeric, date_index, columns=needed, expression=expression,
+                                 group_index=group_index, group_numeric=group_numeric, date_format=date_format, histogram_ranges=histogram_ranges)
+    offsets = [] if index else None
+    with MappedCSV(filename) as reader:
+        analysis.add_rows(reader.records(needed, start, end, offsets=offsets, every=INDEX_EVERY))
+    if index:
+        analysis.index_offsets = offsets
+        analysis.index_rows = list(range(0, len(offsets) * INDEX_EVERY, INDEX_EVERY))
+    return analysis
+
+
+# Analyze a file on several processes. The partial results are merged in file
+# order, which gives the same numbers as one StreamingAnalysis over the file
+# (or over the bytes from start to end, when given). With index=True the
+# chunks' record starts are put together into the row index's.
+def analyze_parallel(filename, header, numeric_indices, filter_index=None, filter_value=None, filter_numeric=False, date_index=None, workers=None, progress=None, start=None, end=None, expression=None, group_index=None, group_numeric=False,
+                     date_format=ISO_DATE_FORMAT, histogram_ranges=None, index=False):
+    ranges = chunk_ranges(filename, start=start, end=end)
+    if progress is not None:
+        progress.start(os.path.getsize(filename))
+
+    analysis = StreamingAnalysis(header, numeric_indices, filter_index, filter_value, filter_numeric, date_index, expression=expression,
+                                 group_index=group_index, group_numeric=group_numeric, date_format=date_format, histogram_ranges=histogram_ranges)
+    if index:
+        analysis.index_rows = []
+        analysis.index_offsets = []
+    if not ranges:
+        return analysis
+
+    # spawn keeps the workers clear of the GUI's threads and Tk state
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context) as executor:
+        futures = [executor.submit(analyze_chunk, filename, start, end, header, numeric_indices, filter_index, filter_value, filter_numeric, date_index, expression, group_index, group_numeric, date_format,
+                                   histogram_ranges, index) for start, end in ranges]
+        sizes = {future: end - start for future, (start, end) in zip(futures, ranges)}
+        pending = set(futures)
+        bytes_done = ranges[0][0]
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                bytes_done += sum(sizes[future] for future in done)
+                if progress is not None:
+                    progress.update(bytes_done)
+        except JobCancelled:
+            for future in pending:
+                future.cancel()
+            raise
+
+    for future in futures:
+        part = future.result()
+        if index:
+            analysis.index_rows.extend(analysis.rows_read + row for row in part.index_rows)
+            analysis.index_offsets.extend(part.index_offsets)
+        analysis.merge(part)
+    return analysis
@@ -0,0 +1,128 @@
+import math
+import tkinter as tk
+from tkinter import ttk
+
+from csv_engine import load_plot_data
+from csv_profile import profiler
+
+# Size of one histogram in the grid, in inches at PLOT_DPI
+PLOT_WIDTH = 4
+PLOT_HEIGHT = 3
+PLOT_DPI = 100
+
+# Histograms side by side before the grid starts a new row
+PLOT_COLUMNS = 3
+
+# The plot window opens at most this large (pixels) and scrolls beyond it
+MAX_WINDOW_WIDTH = 1250
+MAX_WINDOW_HEIGHT = 800
+
+
+# Binary PPM (what a Tk PhotoImage reads without any extra library) from the
+# RGBA pixels Agg renders; the channels are picked out with slice copies
+def ppm_from_rgba(width, height, rgba):
+    rgba = bytes(rgba)
+    rgb = bytearray(width * height * 3)
+    for channel in range(3):
+        rgb[channel::3] = rgba[channel::4]
+    return b'P6 %d %d 255\n' % (width, height) + bytes(rgb)
+
+
+def draw_histogram(ax, column, histogram):
+    # The bins are already counted, matplotlib only draws them
+    edges, counts = histogram.bins_and_counts()
+    if hasattr(ax, 'stairs'):
+        ax.stairs(counts, edges, fill=True)
+    else:
+        ax.bar(edges[:-1], counts, width=[right - left for left, right in zip(edges, edges[1:])], align='edge')
+    ax.set_title(f'Histogram of {column}')
+    ax.set_xlabel(column)
+    ax.set_ylabel('Frequency')
+
+
+# The "Visualize Data" window. All histograms go on one figure, as a grid of
+# subplots, that is cleared and drawn again on every run; it is a plain
+# matplotlib Figure on an Agg canvas rather than a pyplot figure, so nothing
+# is left behind in pyplot's figure registry. Drawing happens off-screen on
+# the background job's thread (render); the Tk thread only puts the finished
+# pixels into one reused window (show).
+class PlotManager:
+    def __init__(self, master):
+        self.master = master
+        self.figure = None
+        self.canvas = None
+        self.window = None
+        self.view = None
+        self.photo = None
+
+    # Background job: histograms of the selected columns, rendered to pixels
+    def load_and_render(self, filename, selected_columns, parallel=False, progress=None):
+        plot_data = load_plot_data(filename, selected_columns, parallel, progress)
+        if not plot_data:
+            return None
+        with profiler.span("render plots", len(plot_data)):
+            return self.render(plot_data)
+
+    # (width, height, PPM bytes) of the whole grid
+    def render(self, plot_data):
+        # matplotlib takes a while to import, so it is only loaded the first time we plot
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        if self.figure is None:
+            self.figure = Figure(dpi=PLOT_DPI)
+            self.canvas = FigureCanvasAgg(self.figure)
+        figure = self.figure
+        figure.clear()
+        columns = min(len(plot_data), PLOT_COLUMNS)
+        rows = math.ceil(len(plot_data) / columns)
+        figure.set_size_inches(columns * PLOT_WIDTH, rows * PLOT_HEIGHT)
+
+        for i, (column, histogram) in enumerate(plot_data):
+            ax = figure.add_subplot(rows, columns, i + 1)
+            try:
+                with profiler.span(f"plot '{column}'", histogram.total()):
+                    draw_histogram(ax, column, histogram)
+            except Exception as e:
+                print(f"Error: Could not visualize column '{column}'. {e}\n")
+                figure.delaxes(ax)
+
+        figure.tight_layout()
+        self.canvas.draw()
+        width, height = self.canvas.get_width_height()
+        return width, height, ppm_from_rgba(width, height, self.canvas.buffer_rgba())
+
+    # Tk thread: show what render made
+    def show(self, rendered):
+        if rendered is None:
+            return
+        width, height, ppm = rendered
+        with profiler.span("show plots"):
+            if self.window is None or not self.window.winfo_exists():
+                self.open_window()
+            self.photo = tk.PhotoImage(data=ppm, format='PPM')
+            self.view.delete("all")
+            self.view.create_image(0, 0, image=self.photo, anchor=tk.NW)
+            self.view.configure(scrollregion=(0, 0, width, height), width=min(width, MAX_WINDOW_WIDTH), height=min(height, MAX_WINDOW_HEIGHT))
+            self.window.deiconify()
+            self.window.lift()
+
+    def open_window(self):
+        self.window = tk.Toplevel(self.master)
+        self.window.title("Data Visualization")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.view = tk.Canvas(self.window, highlightthickness=0)
+        self.view.grid(row=0, column=0, sticky=tk.NSEW)
+        scroll_y = ttk.Scrollbar(self.window, orient="vertical", command=self.view.yview)
+        scroll_y.grid(row=0, column=1, sticky="ns")
+        scroll_x = ttk.Scrollbar(self.window, orient="horizontal", command=self.view.xview)
+        scroll_x.grid(row=1, column=0, sticky="ew")
+        self.view.configure(yscrollcommand=scroll_y.set, xscrollcommand=scroll_x.set)
+        self.window.rowconfigure(0, weight=1)
+        self.window.columnconfigure(0, weight=1)
+
+    def close(self):
+        self.window.destroy()
+        self.window = None
+        self.view = None
+        self.photo = None
@@ -0,0 +1,174 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows has no resource module, peak memory is then only known with tracing on
+    resource = None
+
+# Start with tracemalloc on (slower, but gives the peak of every stage)
+TRACE_MEMORY = os.environ.get("CSV_ANALYZER_TRACE_MEMORY", "0") == "1"
+
+
+# High-water mark of the whole process in bytes, or None if it can't be read
+def peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# One timed stage. rows can be filled in while the span is open.
+class Span:
+    def __init__(self, name, thread, depth, start, rows=None):
+        self.name = name
+        self.thread = thread
+        self.depth = depth
+        self.start = start
+        self.end = None
+        self.rows = rows
+        self.peak_memory = None
+
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+# Records how long each stage of a run took, how many rows it handled and how
+# much memory was in use at its peak. A stage is wrapped in
+#     with profiler.span("filter") as span:
+#         ...
+#         span.rows = len(rows)
+# or, when it starts and ends in different Tk callbacks, begin(detached=True)
+# and end(); a detached span is not the parent of spans opened meanwhile.
+# Timing costs two perf_counter() calls per stage. With tracemalloc on the
+# peak is per stage; otherwise it is the process-wide peak RSS so far.
+class Profiler:
+    def __init__(self, trace_memory=TRACE_MEMORY):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.spans = []
+        self.origin = time.perf_counter()
+        self.set_trace_memory(trace_memory)
+
+    def reset(self):
+        with self.lock:
+            self.spans = []
+            self.origin = time.perf_counter()
+
+    def set_trace_memory(self, enabled):
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def memory_source(self):
+        return "traced" if tracemalloc.is_tracing() else "process RSS"
+
+    # Spans open on the calling thread, innermost last
+    def open_spans(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def begin(self, name, rows=None, detached=False):
+        stack = self.open_spans()
+        if tracemalloc.is_tracing():
+            # The peak is reset for every span, so hand what was seen so far to the open ones
+            peak = tracemalloc.get_traced_memory()[1]
+            for parent in stack:
+                parent.peak_memory = max(parent.peak_memory or 0, peak)
+            tracemalloc.reset_peak()
+        span = Span(name, threading.current_thread().name, len(stack), time.perf_counter(), rows)
+        if not detached:
+            stack.append(span)
+        with self.lock:
+            self.spans.append(span)
+        return span
+
+    def end(self, span, rows=None):
+        span.end = time.perf_counter()
+        if rows is not None:
+            span.rows = rows
+        if tracemalloc.is_tracing():
+            span.peak_memory = max(span.peak_memory or 0, tracemalloc.get_traced_memory()[1])
+        else:
+            span.peak_memory = peak_rss()
+        stack = self.open_spans()
+        if span in stack:
+            stack.remove(span)
+        if tracemalloc.is_tracing():
+            for parent in stack:
+                parent.peak_memory = max(parent.peak_memory or 0, span.peak_memory)
+
+    @contextmanager
+    def span(self, name, rows=None):
+        span = self.begin(name, rows)
+        try:
+            yield span
+        finally:
+            self.end(span)
+
+    def finished_spans(self):
+        with self.lock:
+            return [span for span in self.spans if span.end is not None]
+
+    # Wall time from the first span starting to the last one ending
+    def total_time(self):
+        spans = self.finished_spans()
+        if not spans:
+            return 0.0
+        return max(span.end for span in spans) - min(span.start for span in spans)
+
+    # One line for a status bar: total time, the slowest stage and the peak memory
+    def summary(self):
+        spans = self.finished_spans()
+        if not spans:
+            return "No timings yet"
+        slowest = max((span for span in spans if span.depth == 0), key=Span.duration, default=spans[0])
+        text = f"Last run: {self.total_time():.3f} s, slowest stage '{slowest.name}' {slowest.duration():.3f} s"
+        peaks = [span.peak_memory for span in spans if span.peak_memory is not None]
+        if peaks:
+            text += f", peak memory {max(peaks) / 2 ** 20:.1f} MB ({self.memory_source()})"
+        return text
+
+    # Chrome trace event format: open in chrome://tracing or https://ui.perfetto.dev
+    def chrome_trace(self):
+        pid = os.getpid()
+        events = []
+        threads = {}
+        for span in self.finished_spans():
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            args = {}
+            if span.rows is not None:
+                args['rows'] = span.rows
+            if span.peak_memory is not None:
+                args['peak_memory_bytes'] = span.peak_memory
+            events.append({
+                'name': span.name,
+                'cat': 'csv_analyzer',
+                'ph': 'X',
+                'ts': (span.start - self.origin) * 1e6,
+                'dur': (span.end - span.start) * 1e6,
+                'pid': pid,
+                'tid': tid,
+                'args': args,
+            })
+        for thread, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'memory': self.memory_source()}}
+
+    def save_trace(self, filename):
+        with open(filename, "w") as file:
+            json.dump(self.chrome_trace(), file, indent=1)
+
+
+# The one profiler everything reports to; reset at the start of every job
+profiler = Profiler()
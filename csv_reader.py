@@ -0,0 +1,203 @@
+import hashlib
+import locale
+import mmap
+import os
+import re
+
+# Same encoding open(filename, 'r') would pick
+ENCODING = locale.getpreferredencoding(False)
+
+QUOTED_FIELD = re.compile(rb'"([^"]*(?:""[^"]*)*)"')
+UNQUOTED_FIELD = re.compile(rb'[^,\n]*')
+COMMA = ord(',')
+QUOTE = ord('"')
+NEWLINE = ord('\n')
+
+# Bytes hashed at each end of the part of a file that was already read
+CHECK_BYTES = 64 * 1024
+
+
+# How records() takes some columns out of a line without quotes without
+# splitting every field off it. The columns are cut into a left and a right
+# group where that leaves the fewest fields to split: the left group comes
+# from line.split(b',', left), which stops after `left` fields and keeps the
+# rest of the line in one piece, the right group from an rsplit of that rest
+# (only for rows as wide as the header, so counting from the end is right).
+# Columns in the middle of a wide row cost as much as a full split.
+class Projection:
+    def __init__(self, columns, width):
+        self.columns = columns
+        self.width = width
+        self.wanted = bytearray(width)
+        for i in columns:
+            if i < width:
+                self.wanted[i] = 1
+        order = sorted(set(columns))
+        self.left, self.right = max(order) + 1, 0
+        if order[-1] < width:
+            for cut in range(len(order)):
+                left = order[cut - 1] + 1 if cut else 0
+                right = width - order[cut]
+                if left + right < self.left + self.right:
+                    self.left, self.right = left, right
+
+    # The fields of the columns, decoded; '' past the end of a short row
+    def pick(self, line):
+        if self.right and line.count(b',') == self.width - 1:
+            width = self.width
+            if self.left:
+                head = line.split(b',', self.left)
+                tail = head[-1].rsplit(b',', self.right)
+            else:
+                head = None
+                tail = line.rsplit(b',', self.right)
+            left = self.left
+            # tail ends with the row's last field, so it is indexed from the end
+            return [(head[i] if i < left else tail[i - width]).decode(ENCODING) for i in self.columns]
+        fields = line.split(b',', self.left) if not self.right else line.split(b',')
+        count = len(fields)
+        return [fields[i].decode(ENCODING) if i < count else '' for i in self.columns]
+
+
+# Reads a CSV file straight out of a memory map.
+# Records are tokenized on the raw bytes and only the fields of the requested
+# columns are decoded to str, so there is no text-mode read copy and the OS
+# page cache does all the buffering. Lines without quotes take a fast split;
+# quoted fields (including ones with embedded newlines) follow the same rules
+# as the csv module's default dialect.
+class MappedCSV:
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        if self.size:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b''
+        self.position = 0
+        header_bytes, self.data_start = self.read_record(0)
+        if header_bytes is None:
+            self.close()
+            raise ValueError(f"File '{filename}' is empty.")
+        self.header = [field.decode(ENCODING) for field in header_bytes]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    # Rows between byte offsets start and end (defaults: the whole body).
+    # With `columns`, each row only holds those columns, in that order, and
+    # the other fields are skipped over rather than split off (see Projection).
+    # `position` follows the byte offset of the next record for progress reports.
+    # With an `offsets` list, the start of every `every`-th record is appended to it
+    # (records are numbered from `first`, the row number of the one at `start`).
+    def records(self, columns=None, start=None, end=None, offsets=None, every=0, first=0):
+        data = self.data
+        pos = self.data_start if start is None else start
+        end = self.size if end is None else end
+        count = first
+        projection = Projection(columns, len(self.header)) if columns else None
+        wanted = projection.wanted if projection is not None else None
+        while pos < end:
+            if offsets is not None:
+                if count % every == 0:
+                    offsets.append(pos)
+                count += 1
+            newline = data.find(b'\n', pos, end)
+            if newline == -1:
+                newline = end
+            line = data[pos:newline]
+            if QUOTE in line:
+                fields, pos = self.read_record(pos, wanted)
+            else:
+                pos = newline + 1
+                if line.endswith(b'\r'):
+                    line = line[:-1]
+                if not line:
+                    self.position = pos
+                    yield []
+                    continue
+                if projection is not None:
+                    self.position = pos
+                    yield projection.pick(line)
+                    continue
+                fields = line.split(b',')
+            self.position = pos
+            if columns is None:
+                yield [field.decode(ENCODING) for field in fields]
+            else:
+                width = len(fields)
+                yield [fields[i].decode(ENCODING) if i < width else '' for i in columns]
+
+    # Cheap fingerprint of the first `end` bytes: their length and the bytes at
+    # both ends. Appending to the file leaves it unchanged; truncating or
+    # rewriting the file changes it (unless the edit is in the middle and keeps
+    # the length, which an append-only log never does).
+    def prefix_check(self, end):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(end).encode())
+        digest.update(self.data[:min(end, CHECK_BYTES)])
+        digest.update(self.data[max(0, end - CHECK_BYTES):end])
+        return digest.hexdigest()
+
+    # Tokenize one record starting at pos; returns (list of field bytes, next record offset).
+    # Fields whose flag in `wanted` is 0 (or that lie past its end) are only
+    # scanned over for where they end, and come back as b''.
+    def read_record(self, pos, wanted=None):
+        data = self.data
+        size = self.size
+        if pos >= size:
+            return None, size
+        start = pos
+        fields = []
+        while True:
+            if wanted is not None and (len(fields) >= len(wanted) or not wanted[len(fields)]):
+                pos = self.skip_field(pos)
+                fields.append(b'')
+            elif pos < size and data[pos] == QUOTE:
+                match = QUOTED_FIELD.match(data, pos)
+                if match is None:
+                    # Unterminated quote: the rest of the file is the field
+                    fields.append(data[pos + 1:size].replace(b'""', b'"'))
+                    pos = size
+                else:
+                    field = match.group(1).replace(b'""', b'"')
+                    # Anything between the closing quote and the delimiter is kept as-is
+                    rest = UNQUOTED_FIELD.match(data, match.end())
+                    fields.append(field + rest.group())
+                    pos = rest.end()
+            else:
+                match = UNQUOTED_FIELD.match(data, pos)
+                fields.append(match.group())
+                pos = match.end()
+            if pos >= size:
+                break
+            if data[pos] == COMMA:
+                pos += 1
+                continue
+            pos += 1
+            break
+
+        last = fields[-1]
+        if last.endswith(b'\r'):
+            fields[-1] = last[:-1]
+        # A blank line has no fields, a line of just "" has one empty field
+        if fields == [b''] and data[start] != QUOTE:
+            fields = []
+        return fields, pos
+
+    # Where the field starting at pos ends, without building it
+    def skip_field(self, pos):
+        data = self.data
+        if pos < self.size and data[pos] == QUOTE:
+            match = QUOTED_FIELD.match(data, pos)
+            if match is None:
+                return self.size
+            return UNQUOTED_FIELD.match(data, match.end()).end()
+        return UNQUOTED_FIELD.match(data, pos).end()
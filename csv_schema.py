@@ -0,0 +1,112 @@
+import math
+from collections import deque
+from itertools import islice
+
+from csv_reader import MappedCSV
+from csv_stats import ISO_DATE_FORMAT, is_blank, parse_day, to_number
+
+# Rows read at each of the head, the middle and the tail of a file
+SAMPLE_ROWS = 200
+
+# A column is numeric (or dates in one format) when at least this share of its
+# non-blank sampled cells parse as such; the others become invalid cells
+TYPE_SHARE = 0.95
+
+# Date formats tried on text columns, in this order
+DATE_FORMATS = [ISO_DATE_FORMAT, '%Y/%m/%d', '%d/%m/%Y', '%m/%d/%Y', '%d.%m.%Y', '%d-%m-%Y', '%Y-%m-%d %H:%M:%S']
+
+
+# What sampling found out about one column. kind is 'numeric', 'date' or
+# 'text'; null_rate is the share of blank sampled cells. A numeric column
+# also has the smallest and largest sampled value, which is where its
+# histogram bins start out (see csv_stats.Histogram).
+class ColumnSchema:
+    def __init__(self, name, kind='text', null_rate=0.0, date_format=None, minimum=None, maximum=None):
+        self.name = name
+        self.kind = kind
+        self.null_rate = null_rate
+        self.date_format = date_format
+        self.minimum = minimum
+        self.maximum = maximum
+
+
+# Column types of one file, inferred from rows sampled at its head, middle
+# and tail (see infer_schema). Parsing a column as numbers, or its dates with
+# one known format, is decided here once instead of row by row.
+class Schema:
+    def __init__(self, header, columns, sampled_rows):
+        self.header = header
+        self.columns = columns
+        self.sampled_rows = sampled_rows
+
+    def column(self, name):
+        return self.columns[self.header.index(name)]
+
+    def numeric_flags(self):
+        return [column.kind == 'numeric' for column in self.columns]
+
+    # The format to parse a column's dates with; ISO when sampling found none
+    def date_format(self, name):
+        return self.column(name).date_format or ISO_DATE_FORMAT
+
+
+def infer_column(name, cells):
+    filled = [text.strip() for text in cells if not is_blank(text)]
+    null_rate = (len(cells) - len(filled)) / len(cells) if cells else 0.0
+    if not filled:
+        return ColumnSchema(name, 'text', null_rate)
+    needed = len(filled) * TYPE_SHARE
+    numbers = [number for number in map(to_number, filled) if number is not None]
+    if len(numbers) >= needed:
+        finite = [number for number in numbers if math.isfinite(number)]
+        if not finite:
+            return ColumnSchema(name, 'numeric', null_rate)
+        return ColumnSchema(name, 'numeric', null_rate, minimum=min(finite), maximum=max(finite))
+    for date_format in DATE_FORMATS:
+        if sum(parse_day(text, date_format) is not None for text in filled) >= needed:
+            return ColumnSchema(name, 'date', null_rate, date_format)
+    return ColumnSchema(name, 'text', null_rate)
+
+
+# First record start at or after pos, assuming pos is not inside a quoted field
+def line_start(reader, pos):
+    if pos <= reader.data_start:
+        return reader.data_start
+    newline = reader.data.find(b'\n', pos - 1)
+    return reader.size if newline == -1 else newline + 1
+
+
+# Up to `rows` rows from each of the head, the middle and the tail of the file.
+# The middle and tail are reached by seeking, so a huge file costs no more
+# than a small one. A seek can land inside a quoted field that spans lines;
+# rows whose width doesn't match the header are dropped, which throws out
+# what is read out of step until the next real record.
+def sample_rows(reader, rows=SAMPLE_ROWS):
+    records = reader.records()
+    sample = list(islice(records, rows))
+    head_end = reader.position
+    if head_end >= reader.size or not sample:
+        return sample
+
+    width = len(reader.header)
+    # The head says how long a record is on average, which places the tail
+    record_bytes = max(1, (head_end - reader.data_start) // len(sample))
+    tail = line_start(reader, max(head_end, reader.size - record_bytes * rows * 3 // 2))
+    middle = line_start(reader, max(head_end, (reader.data_start + reader.size) // 2))
+    if middle < tail:
+        sample += [row for row in islice(reader.records(start=middle, end=tail), rows) if len(row) == width]
+    sample += [row for row in deque(reader.records(start=tail), maxlen=rows) if len(row) == width]
+    return sample
+
+
+# The Schema of an open MappedCSV
+def infer_schema(reader, rows=SAMPLE_ROWS):
+    header = reader.header
+    sample = sample_rows(reader, rows)
+    columns = [infer_column(name, [row[i] if i < len(row) else '' for row in sample]) for i, name in enumerate(header)]
+    return Schema(header, columns, len(sample))
+
+
+def read_schema(filename):
+    with MappedCSV(filename) as reader:
+        return infer_schema(reader)
@@ -0,0 +1,99 @@
+import heapq
+import os
+import tempfile
+from array import array
+from itertools import compress, islice
+
+# Memory one sort may use before it spills sorted runs to temporary files, in
+# MB (override with CSV_ANALYZER_SORT_MB)
+DEFAULT_SORT_MEMORY_MB = 512
+SORT_MEMORY_BUDGET = int(os.environ.get('CSV_ANALYZER_SORT_MB', DEFAULT_SORT_MEMORY_MB)) * 1024 * 1024
+
+# Rough cost of sorting one row in memory: the list slot, the row number and its key
+SORT_BYTES_PER_ROW = 80
+
+# Row numbers read back from a run file at a time while merging
+MERGE_BLOCK_ROWS = 65536
+
+# Sort key of blank and unparseable cells, so they come after everything else
+MISSING = float('inf')
+
+
+# Sorting works on row numbers and a float key per row (see the columns'
+# sort_keys), so numbers, dates and text ranks all sort the same way and the
+# sort is stable: equal keys keep file order.
+
+# `rows` (None for all) ordered by keys[row]. Above memory_budget the rows are
+# sorted in runs that are written to temporary files and merged back.
+# `progress` (a csv_jobs.Progress) counts rows: each is sorted into a run and
+# then merged, so an external sort reports twice the row count in all.
+def sorted_rows(rows, keys, memory_budget=None, progress=None):
+    if rows is None:
+        rows = range(len(keys))
+    budget = SORT_MEMORY_BUDGET if memory_budget is None else memory_budget
+    run_rows = max(MERGE_BLOCK_ROWS, budget // SORT_BYTES_PER_ROW)
+    if len(rows) <= run_rows:
+        if progress is not None:
+            progress.start(len(rows))
+        result = array('l', sorted(rows, key=keys.__getitem__))
+        if progress is not None:
+            progress.update(len(rows))
+        return result
+    return external_sort(rows, keys, run_rows, progress)
+
+
+def external_sort(rows, keys, run_rows, progress=None):
+    key = keys.__getitem__
+    if progress is not None:
+        progress.start(2 * len(rows))
+    with tempfile.TemporaryDirectory(prefix='csv_analyzer_sort_') as directory:
+        runs = []
+        for start in range(0, len(rows), run_rows):
+            run = array('l', sorted(rows[start:start + run_rows], key=key))
+            path = os.path.join(directory, f'run{len(runs)}.bin')
+            with open(path, 'wb') as file:
+                run.tofile(file)
+            runs.append((path, len(run)))
+            del run
+            if progress is not None:
+                progress.update(min(start + run_rows, len(rows)))
+
+        files = [open(path, 'rb') for path, _ in runs]
+        try:
+            # heapq.merge takes equal keys from earlier runs first, which keeps the sort stable
+            merged = array('l')
+            merging = heapq.merge(*(read_run(file, count) for file, (_, count) in zip(files, runs)), key=key)
+            while len(merged) < len(rows):
+                merged.extend(islice(merging, MERGE_BLOCK_ROWS))
+                if progress is not None:
+                    progress.update(len(rows) + len(merged))
+        finally:
+            for file in files:
+                file.close()
+    return merged
+
+
+def read_run(file, count):
+    while count:
+        block = array('l')
+        block.fromfile(file, min(count, MERGE_BLOCK_ROWS))
+        count -= len(block)
+        yield from block
+
+
+# The first k of `rows` (None for all) in key order, without sorting the rest:
+# the k-th smallest key is found with a heap over the bare floats, then only
+# rows at or below it are sorted.
+def top_rows(rows, keys, k):
+    if rows is None:
+        rows = range(len(keys))
+        row_keys = keys
+    else:
+        row_keys = array('d', map(keys.__getitem__, rows))
+    if k >= len(rows):
+        return sorted_rows(rows, keys)
+    if k <= 0:
+        return array('l')
+    threshold = heapq.nsmallest(k, row_keys)[-1]
+    candidates = compress(rows, map(threshold.__ge__, row_keys))
+    return array('l', sorted(candidates, key=keys.__getitem__)[:k])
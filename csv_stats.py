@@ -0,0 +1,739 @@
+import copy
+import math
+import random
+from array import array
+from collections import Counter
+from datetime import date, datetime
+from functools import lru_cache
+
+
+# Once a column has more distinct values than this, median and mode switch
+# from exact value counts to the bounded-memory sketches below
+EXACT_DISTINCT_LIMIT = 100000
+
+# Size of the quantile sketch. With k=200 the rank of a returned quantile is
+# within about +/-1.65% of the requested one (99% confidence).
+QUANTILE_SKETCH_K = 200
+
+# Number of counters kept for the mode. A count is never overestimated and is
+# underestimated by at most n / (k + 1), so any value making up more than
+# 1 / (k + 1) of the column is guaranteed to be tracked.
+MODE_SKETCH_K = 1000
+
+# A group-by stops with an error past this many distinct keys
+MAX_GROUPS = 10000
+
+# Bins of a histogram over a known range (what ax.hist used to default to).
+# A histogram that has to widen keeps between this many and twice as many.
+HISTOGRAM_BINS = 10
+
+ISO_DATE_FORMAT = '%Y-%m-%d'
+
+# Distinct date strings remembered by parse_day; a date column rarely has more
+DATE_CACHE_SIZE = 65536
+
+# Example row numbers kept for each column and kind of problem
+DIAGNOSTIC_SAMPLE_ROWS = 10
+
+# Kinds of problem a cell can have
+NOT_NUMBER = 'non-numerical value'
+MISSING_DATE = 'missing date'
+INVALID_DATE = 'invalid date'
+
+
+# KLL quantile sketch (Karnin, Lang & Liberty).
+# Level h holds items that each stand for 2**h original values. When a level
+# fills up it is sorted and every other item (random offset) is promoted to
+# the next level, so memory stays around 3k items whatever the stream length.
+# Sketches are mergeable: concatenate the levels and compact again.
+class QuantileSketch:
+    def __init__(self, k=QUANTILE_SKETCH_K, seed=0):
+        self.k = k
+        self.random = random.Random(seed)
+        self.compactors = []
+        self.count = 0
+        self.size = 0
+        self.max_size = 0
+        self.grow()
+
+    def grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self.capacity(h) for h in range(len(self.compactors)))
+
+    def capacity(self, h):
+        depth = len(self.compactors) - h - 1
+        return int(math.ceil(self.k * (2 / 3) ** depth)) + 1
+
+    def update(self, value, weight=1):
+        # A weight is split into its binary digits, one item per set bit
+        self.count += weight
+        h = 0
+        while weight:
+            if weight & 1:
+                while h >= len(self.compactors):
+                    self.grow()
+                self.compactors[h].append(value)
+                self.size += 1
+            weight >>= 1
+            h += 1
+        while self.size >= self.max_size:
+            self.compress()
+
+    def compress(self):
+        for h in range(len(self.compactors)):
+            compactor = self.compactors[h]
+            if len(compactor) >= self.capacity(h):
+                if h + 1 >= len(self.compactors):
+                    self.grow()
+                compactor.sort()
+                # An odd item out stays behind on this level
+                leftover = [compactor.pop()] if len(compactor) % 2 else []
+                self.compactors[h + 1].extend(compactor[self.random.randint(0, 1)::2])
+                self.compactors[h] = leftover
+                self.size = sum(len(items) for items in self.compactors)
+                return
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.grow()
+        for h, items in enumerate(other.compactors):
+            self.compactors[h].extend(items)
+        self.count += other.count
+        self.size = sum(len(items) for items in self.compactors)
+        while self.size >= self.max_size:
+            self.compress()
+        return self
+
+    def quantile(self, q):
+        weighted = sorted((value, 1 << h) for h, items in enumerate(self.compactors) for value in items)
+        if not weighted:
+            return None
+        total = sum(weight for _, weight in weighted)
+        target = q * total
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return value
+        return weighted[-1][0]
+
+
+# Misra-Gries heavy hitters, used for the mode of big columns.
+# Up to 2k counters are kept; when that overflows every counter is lowered by
+# the (k+1)-th largest count and the ones that reach zero are dropped. The
+# total amount taken off (`error`) bounds how far any count can be too low.
+class ModeSketch:
+    def __init__(self, k=MODE_SKETCH_K):
+        self.k = k
+        self.counters = {}
+        self.count = 0
+        self.error = 0
+
+    def update(self, value, weight=1):
+        self.count += weight
+        self.counters[value] = self.counters.get(value, 0) + weight
+        if len(self.counters) > 2 * self.k:
+            self.prune()
+
+    def prune(self):
+        cut = sorted(self.counters.values(), reverse=True)[self.k]
+        self.counters = {value: count - cut for value, count in self.counters.items() if count > cut}
+        self.error += cut
+
+    def merge(self, other):
+        self.count += other.count
+        self.error += other.error
+        for value, count in other.counters.items():
+            self.counters[value] = self.counters.get(value, 0) + count
+        if len(self.counters) > 2 * self.k:
+            self.prune()
+        return self
+
+    def mode(self):
+        if not self.counters:
+            return None
+        # First value seen wins a tie, like statistics.mode
+        return max(self.counters, key=self.counters.get)
+
+
+# Running statistics for one numeric column.
+# Values are folded in one at a time, so a column never has to be held in a
+# list. count/sum/min/max are kept exactly and the mean/variance use Welford's
+# update. Two accumulators built over different parts of a file can be combined
+# with merge(), which gives the same numbers as a single pass over both parts.
+# Median and mode are exact until the column has more than
+# EXACT_DISTINCT_LIMIT distinct values; after that they come from sketches and
+# `approximate` is set.
+class ColumnStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        # Median and mode need the value distribution; repeated values only
+        # cost one entry each.
+        self.value_counts = Counter()
+        self.quantile_sketch = None
+        self.mode_sketch = None
+
+    @property
+    def approximate(self):
+        return self.value_counts is None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.value_counts is not None:
+            self.value_counts[value] += 1
+            if len(self.value_counts) > EXACT_DISTINCT_LIMIT:
+                self.switch_to_sketches()
+        else:
+            self.quantile_sketch.update(value)
+            self.mode_sketch.update(value)
+
+    def switch_to_sketches(self):
+        self.quantile_sketch = QuantileSketch()
+        self.mode_sketch = ModeSketch()
+        for value, count in self.value_counts.items():
+            self.quantile_sketch.update(value, count)
+            self.mode_sketch.update(value, count)
+        self.value_counts = None
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count = other.count
+            self.total = other.total
+            self.minimum = other.minimum
+            self.maximum = other.maximum
+            self.mean = other.mean
+            self.m2 = other.m2
+            if other.approximate:
+                self.value_counts = None
+                self.quantile_sketch = QuantileSketch().merge(other.quantile_sketch)
+                self.mode_sketch = ModeSketch().merge(other.mode_sketch)
+            else:
+                self.value_counts = Counter(other.value_counts)
+            return self
+
+        # Chan et al. pairwise combination of the Welford state
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+        if not self.approximate and not other.approximate:
+            self.value_counts.update(other.value_counts)
+            if len(self.value_counts) > EXACT_DISTINCT_LIMIT:
+                self.switch_to_sketches()
+            return self
+        if not self.approximate:
+            self.switch_to_sketches()
+        if other.approximate:
+            self.quantile_sketch.merge(other.quantile_sketch)
+            self.mode_sketch.merge(other.mode_sketch)
+        else:
+            for value, value_count in other.value_counts.items():
+                self.quantile_sketch.update(value, value_count)
+                self.mode_sketch.update(value, value_count)
+        return self
+
+    def average(self):
+        return self.total / self.count
+
+    def variance(self):
+        if self.count < 2:
+            return None
+        return self.m2 / (self.count - 1)
+
+    def stdev(self):
+        variance = self.variance()
+        if variance is None:
+            return None
+        return math.sqrt(variance)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        if self.approximate:
+            return self.quantile_sketch.quantile(q)
+        # Same interpolation as statistics.quantiles(method='inclusive')
+        position = q * (self.count - 1)
+        lower_pos = int(position)
+        upper_pos = min(lower_pos + 1, self.count - 1)
+        lower = upper = None
+        seen = 0
+        for value in sorted(self.value_counts):
+            seen += self.value_counts[value]
+            if lower is None and seen > lower_pos:
+                lower = value
+            if seen > upper_pos:
+                upper = value
+                break
+        return lower + (upper - lower) * (position - lower_pos)
+
+    def median(self):
+        if self.count == 0:
+            return None
+        if self.approximate:
+            return self.quantile_sketch.quantile(0.5)
+        # Walk the distinct values in order until we reach the middle position(s)
+        lower_pos = (self.count - 1) // 2
+        upper_pos = self.count // 2
+        lower = None
+        seen = 0
+        for value in sorted(self.value_counts):
+            seen += self.value_counts[value]
+            if lower is None and seen > lower_pos:
+                lower = value
+            if seen > upper_pos:
+                if lower_pos == upper_pos:
+                    return value
+                return (lower + value) / 2
+        return lower
+
+    def mode(self):
+        if self.count == 0:
+            return "No mode"
+        if self.approximate:
+            return self.mode_sketch.mode()
+        return self.value_counts.most_common(1)[0][0]
+
+
+# A histogram kept as counts per bin, so plotting costs the same whatever the
+# number of rows. Bin j covers [origin + j * width, origin + (j + 1) * width);
+# the top of the range it was made for is closed, like numpy's last bin.
+# Values outside that range open new bins, and once the bins in use span
+# more than twice `bins`, pairs of bins are merged (the width doubles). Bins
+# always sit on the same grid, so histograms made for the same range can be
+# merged exactly whatever each one has seen.
+class Histogram:
+    def __init__(self, low, high, bins=HISTOGRAM_BINS):
+        low, high = float(low), float(high)
+        if not high > low:
+            # A single value still needs a bin of some width
+            high = low + 1.0
+        self.origin = low
+        self.high = high
+        self.bins = bins
+        self.width = (high - low) / bins
+        self.top = self.top_bin()
+        self.counts = Counter()
+        # Infinite and NaN values have no bin
+        self.skipped = 0
+
+    # The bin a value equal to `high` goes in
+    def top_bin(self):
+        top = (self.high - self.origin) / self.width
+        return math.ceil(top) - 1 if top == math.floor(top) else math.floor(top)
+
+    def add(self, value):
+        if value == self.high:
+            j = self.top
+        else:
+            try:
+                j = math.floor((value - self.origin) / self.width)
+            except (OverflowError, ValueError):
+                self.skipped += 1
+                return
+        counts = self.counts
+        if j in counts:
+            counts[j] += 1
+        else:
+            counts[j] = 1
+            self.shrink()
+
+    # A whole array of values at once; the binning runs in C
+    def add_values(self, values):
+        finite = values if math.isfinite(sum(values)) else array('d', filter(math.isfinite, values))
+        self.skipped += len(values) - len(finite)
+        shift = -self.origin
+        scale = 1 / self.width
+        self.counts.update(map(math.floor, map(scale.__mul__, map(shift.__add__, finite))))
+        # Values equal to the top belong in the closed top bin, not where the arithmetic put them
+        at_top = finite.count(self.high)
+        landed = math.floor(scale * (shift + self.high))
+        if at_top and landed != self.top:
+            self.counts[landed] -= at_top
+            self.counts[self.top] += at_top
+            if not self.counts[landed]:
+                del self.counts[landed]
+        self.shrink()
+
+    def double_width(self):
+        self.width *= 2
+        self.top = self.top_bin()
+        merged = Counter()
+        for j, count in self.counts.items():
+            # Bin j lies in bin j // 2 of the grid twice as wide
+            merged[j // 2] += count
+        self.counts = merged
+
+    # Merge bins until the ones in use span at most twice `bins`
+    def shrink(self):
+        while self.counts and max(self.counts) - min(self.counts) >= 2 * self.bins:
+            self.double_width()
+
+    # `other` must have been made for the same range
+    def merge(self, other):
+        other = copy.copy(other)
+        while self.width < other.width:
+            self.double_width()
+        while other.width < self.width:
+            other.double_width()
+        self.counts.update(other.counts)
+        self.skipped += other.skipped
+        self.shrink()
+        return self
+
+    def total(self):
+        return sum(self.counts.values())
+
+    # (bin edges, counts) from the lowest to the highest bin in use, for
+    # ax.stairs(counts, edges) or a bar chart
+    def bins_and_counts(self):
+        if not self.counts:
+            return [self.origin, self.high], [0]
+        first, last = min(self.counts), max(self.counts)
+        edges = [self.origin + j * self.width for j in range(first, last + 2)]
+        return edges, [self.counts.get(j, 0) for j in range(first, last + 1)]
+
+
+# Day number (date.toordinal) of a date string, or None if it isn't one.
+# YYYY-MM-DD strings go through date.fromisoformat, which is many times faster
+# than strptime; anything else falls back to strptime with date_format. Each
+# distinct string is only parsed once.
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_day(text, date_format=ISO_DATE_FORMAT):
+    if date_format == ISO_DATE_FORMAT and len(text) == 10 and text[4] == '-' and text[7] == '-':
+        try:
+            return date.fromisoformat(text).toordinal()
+        except ValueError:
+            pass
+    try:
+        return datetime.strptime(text, date_format).toordinal()
+    except ValueError:
+        return None
+
+
+# Oldest and newest date of a column, kept as day numbers, plus how many
+# cells were unusable
+class DateStats:
+    def __init__(self, date_format=ISO_DATE_FORMAT):
+        self.date_format = date_format
+        self.count = 0
+        self.oldest_day = None
+        self.newest_day = None
+        self.missing = 0
+        self.invalid = 0
+
+    @property
+    def oldest(self):
+        return datetime.fromordinal(self.oldest_day) if self.oldest_day is not None else None
+
+    @property
+    def newest(self):
+        return datetime.fromordinal(self.newest_day) if self.newest_day is not None else None
+
+    # Returns MISSING_DATE or INVALID_DATE for a cell that is skipped, else None
+    def add(self, date_str, rows=1):
+        if not date_str:
+            self.missing += rows
+            return MISSING_DATE
+        day = parse_day(date_str, self.date_format)
+        if day is None:
+            self.invalid += rows
+            return INVALID_DATE
+        self.add_day(day, rows)
+        return None
+
+    def add_day(self, day, rows=1):
+        self.count += rows
+        if self.oldest_day is None or day < self.oldest_day:
+            self.oldest_day = day
+        if self.newest_day is None or day > self.newest_day:
+            self.newest_day = day
+
+    def merge(self, other):
+        self.count += other.count
+        self.missing += other.missing
+        self.invalid += other.invalid
+        if other.oldest_day is not None and (self.oldest_day is None or other.oldest_day < self.oldest_day):
+            self.oldest_day = other.oldest_day
+        if other.newest_day is not None and (self.newest_day is None or other.newest_day > self.newest_day):
+            self.newest_day = other.newest_day
+        return self
+
+
+# Problems found in the cells of an analysis, counted per column and kind of
+# problem instead of printed one line per row (which on a dirty file takes
+# longer than the analysis). The first DIAGNOSTIC_SAMPLE_ROWS row numbers of
+# each are kept as examples; rows are numbered from 1 like the data grid.
+class Diagnostics:
+    def __init__(self):
+        # (column, problem) -> count, in the order first seen
+        self.counts = {}
+        # (column, problem) -> example row numbers
+        self.rows = {}
+
+    def add(self, column, problem, row=None, count=1):
+        key = (column, problem)
+        self.counts[key] = self.counts.get(key, 0) + count
+        if row is not None:
+            examples = self.rows.setdefault(key, [])
+            if len(examples) < DIAGNOSTIC_SAMPLE_ROWS:
+                examples.append(row)
+
+    # `count` problems at once; rows are some of their row numbers
+    def add_many(self, column, problem, count, rows):
+        key = (column, problem)
+        self.counts[key] = self.counts.get(key, 0) + count
+        examples = self.rows.setdefault(key, [])
+        examples.extend(rows[:DIAGNOSTIC_SAMPLE_ROWS - len(examples)])
+
+    # `other` covers the rows after the first row_offset ones
+    def merge(self, other, row_offset=0):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+            examples = self.rows.setdefault(key, [])
+            for row in other.rows.get(key, ()):
+                if len(examples) >= DIAGNOSTIC_SAMPLE_ROWS:
+                    break
+                examples.append(row + row_offset)
+        return self
+
+    def total(self):
+        return sum(self.counts.values())
+
+    def count(self, column, problem):
+        return self.counts.get((column, problem), 0)
+
+    # (column, problem, count, example rows) for every kind of problem found
+    def entries(self):
+        return [(column, problem, count, self.rows.get((column, problem), [])) for (column, problem), count in self.counts.items()]
+
+    def summary_lines(self):
+        lines = []
+        for column, problem, count, rows in self.entries():
+            line = f"{count} {problem}(s) in column '{column}', rows skipped"
+            if rows:
+                more = ", ..." if count > len(rows) else ""
+                line += f" (rows {', '.join(map(str, rows))}{more})"
+            lines.append(line + ".")
+        return lines
+
+    # Append the summary to a log file, in one write
+    def write_log(self, filename, source):
+        text = f"{datetime.now().isoformat(timespec='seconds')} {source}: {self.total()} problem(s)\n"
+        text += "".join(f"  {line}\n" for line in self.summary_lines())
+        with open(filename, 'a') as file:
+            file.write(text)
+
+
+# Single pass over the rows of a CSV file.
+# Rows are filtered as they arrive and every numeric column gets its own
+# ColumnStats, so memory does not depend on the number of rows. Which columns
+# are numeric, and the date column's format, is decided up front from a
+# sample of the file (see csv_schema), the same schema the columnar tables use, and a
+# numeric filter column is compared by value just like Table.filter_rows.
+# None of the statistics depend on row order, so there is no sorting here.
+# Analyses of consecutive parts of a file combine with merge().
+# Rows may carry only some of the file's columns (see MappedCSV.records);
+# `columns` then lists which file columns they hold, in order.
+class StreamingAnalysis:
+    def __init__(self, header, numeric_indices, filter_index=None, filter_value=None, filter_numeric=False, date_index=None, columns=None, expression=None, group_index=None, group_numeric=False,
+                 date_format=ISO_DATE_FORMAT, histogram_ranges=None):
+        self.header = header
+        self.numeric_indices = list(numeric_indices)
+        self.filter_index = filter_index
+        self.filter_value = filter_value
+        self.filter_number = None
+        if filter_index is not None and filter_numeric:
+            try:
+                self.filter_number = float(filter_value)
+            except ValueError:
+                pass
+        self.filter_numeric = filter_numeric
+        self.date_index = date_index
+
+        if columns is None:
+            position = {i: i for i in range(len(header))}
+        else:
+            position = {i: k for k, i in enumerate(columns)}
+        self.numeric_positions = [(i, position[i]) for i in self.numeric_indices]
+        self.filter_position = position[filter_index] if filter_index is not None else None
+        self.date_position = position[date_index] if date_index is not None else None
+        # A csv_filter.RowFilter, applied on top of the equality filter
+        self.expression = expression
+        self.position = position
+        self.row_test = expression.row_test(position) if expression is not None else None
+        self.group_index = group_index
+        self.group_numeric = group_numeric
+        self.group_position = position[group_index] if group_index is not None else None
+
+        self.rows_read = 0
+        self.rows_matched = 0
+        self.column_stats = {i: ColumnStats() for i in self.numeric_indices}
+        self.date_stats = DateStats(date_format) if date_index is not None else None
+        self.diagnostics = Diagnostics()
+        # With histogram_ranges ({column index: (low, high)}), a Histogram per numeric column
+        self.histograms = None
+        if histogram_ranges is not None:
+            self.histograms = {i: Histogram(*histogram_ranges[i]) for i in self.numeric_indices}
+        # Group key -> GroupStats when grouping
+        self.groups = {} if group_index is not None else None
+        # (row numbers, byte offsets) of record starts picked up for the row
+        # index on the way, when the scan was asked to (see csv_parallel)
+        self.index_rows = None
+        self.index_offsets = None
+
+    # The row test is made of closures, which can't be pickled; workers
+    # send the expression back and the test is rebuilt from it
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['row_test'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.expression is not None:
+            self.row_test = self.expression.row_test(self.position)
+
+    # In a numeric column a value that isn't a number matches cells with exactly that text
+    def matches(self, row):
+        text = cell(row, self.filter_position)
+        if not self.filter_numeric or self.filter_number is None:
+            return text == self.filter_value
+        try:
+            return float(text) == self.filter_number
+        except ValueError:
+            return False
+
+    def add_row(self, row):
+        self.rows_read += 1
+        if self.filter_index is not None and not self.matches(row):
+            return
+        if self.row_test is not None and not self.row_test(row):
+            return
+        self.rows_matched += 1
+
+        group = None
+        if self.groups is not None:
+            key = group_key(cell(row, self.group_position), self.group_numeric)
+            group = self.groups.get(key)
+            if group is None:
+                group = self.add_group(key)
+            group.rows += 1
+
+        for i, position in self.numeric_positions:
+            try:
+                value = float(cell(row, position))
+            except ValueError:
+                self.diagnostics.add(self.header[i], NOT_NUMBER, self.rows_read)
+                continue
+            self.column_stats[i].add(value)
+            if group is not None:
+                group.column_stats[i].add(value)
+            if self.histograms is not None:
+                self.histograms[i].add(value)
+
+        if self.date_stats is not None:
+            problem = self.date_stats.add(cell(row, self.date_position))
+            if problem is not None:
+                self.diagnostics.add(self.header[self.date_index], problem, self.rows_read)
+
+    def add_rows(self, rows):
+        for row in rows:
+            self.add_row(row)
+
+    def add_group(self, key):
+        if len(self.groups) >= MAX_GROUPS:
+            raise ValueError(f"Column '{self.header[self.group_index]}' has more than {MAX_GROUPS} distinct values, too many to group by.")
+        group = self.groups[key] = GroupStats(self.numeric_indices)
+        return group
+
+    def merge(self, other):
+        # other's rows come after this analysis' rows
+        self.diagnostics.merge(other.diagnostics, self.rows_read)
+        self.rows_read += other.rows_read
+        self.rows_matched += other.rows_matched
+        for i in self.numeric_indices:
+            self.column_stats[i].merge(other.column_stats[i])
+            if self.histograms is not None:
+                self.histograms[i].merge(other.histograms[i])
+        if self.date_stats is not None:
+            self.date_stats.merge(other.date_stats)
+        if self.groups is not None:
+            for key, other_group in other.groups.items():
+                group = self.groups.get(key)
+                if group is None:
+                    group = self.add_group(key)
+                group.merge(other_group)
+        return self
+
+
+# Rows and per-column statistics of one group of a group-by
+class GroupStats:
+    def __init__(self, numeric_indices):
+        self.rows = 0
+        self.column_stats = {i: ColumnStats() for i in numeric_indices}
+
+    def merge(self, other):
+        self.rows += other.rows
+        for i, stats in self.column_stats.items():
+            stats.merge(other.column_stats[i])
+        return self
+
+
+def is_blank(text):
+    return not text or text.isspace()
+
+
+# The number in a cell, or None. Whatever float() reads is a number (NaN and
+# inf too), the same rule the numeric columns are parsed with.
+def to_number(text):
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def number_text(value):
+    # Whole numbers without the ".0", so 30 and 30.0 are the same key
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+# Group key of a cell: the text itself, or for a numeric key column the
+# cell the way csv_table.NumericColumn.text gives it back: the number spelled
+# by number_text, '' for a blank cell and the cell's own text ("N/A") for
+# anything else
+def group_key(text, numeric):
+    if not numeric:
+        return text
+    try:
+        return number_text(float(text))
+    except ValueError:
+        return '' if is_blank(text) else text
+
+
+def cell(row, index):
+    # Short rows are treated as having empty trailing cells
+    if index < len(row):
+        return row[index]
+    return ''
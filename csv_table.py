@@ -0,0 +1,544 @@
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress, islice
+from math import isfinite, isnan
+from operator import not_
+
+from csv_index import INDEX_EVERY, extend_index, load_index, save_index
+from csv_jobs import PROGRESS_EVERY_ROWS
+from csv_profile import profiler
+from csv_reader import NEWLINE, MappedCSV
+from csv_schema import infer_schema
+from csv_sort import MISSING, sorted_rows, top_rows
+from csv_stats import (DIAGNOSTIC_SAMPLE_ROWS, HISTOGRAM_BINS, INVALID_DATE, ISO_DATE_FORMAT, MAX_GROUPS, MISSING_DATE, NOT_NUMBER, ColumnStats, DateStats,
+                       GroupStats, Histogram, is_blank, number_text, parse_day, to_number)
+
+# How many distinct values are looked at to tell how a text column without a
+# date format sorts
+TYPE_SAMPLE_ROWS = 100
+
+# Ints below this are shared objects in CPython, larger codes each cost an int
+SMALL_INTS = 257
+
+# Keep a sorted index of a date column once a date range filter has used it
+# (set CSV_ANALYZER_DATE_INDEX=0 to always scan instead)
+USE_DATE_INDEX = os.environ.get('CSV_ANALYZER_DATE_INDEX', '1') != '0'
+
+
+# A parsed numeric column: one contiguous array of doubles plus a validity
+# mask (1 = parsed, 0 = blank or not a number). Nothing is stored per cell
+# except the 8 bytes of the value and 1 byte of mask; the few cells that are
+# text other than blanks ("N/A") keep their text in `texts` (row -> text), so
+# they can still be shown and filtered on.
+class NumericColumn:
+    kind = 'numeric'
+
+    def __init__(self, name):
+        self.name = name
+        self.values = array('d')
+        self.valid = bytearray()
+        self.invalid = 0
+        self.texts = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, text):
+        try:
+            self.values.append(float(text))
+            self.valid.append(1)
+        except ValueError:
+            if not is_blank(text):
+                self.texts[len(self.values)] = text
+            self.values.append(0.0)
+            self.valid.append(0)
+            self.invalid += 1
+
+    # Drop the rows from `length` on (an append that was cancelled half way)
+    def truncate(self, length):
+        self.invalid -= self.valid.count(0, length)
+        del self.values[length:]
+        del self.valid[length:]
+        for row in [row for row in self.texts if row >= length]:
+            del self.texts[row]
+
+    def text(self, row):
+        if not self.valid[row]:
+            return self.texts.get(row, '')
+        return number_text(self.values[row])
+
+    # One float per row to sort by; missing values (and NaN) go after every number
+    def sort_keys(self):
+        keys = array('d', self.values)
+        rows = range(len(keys))
+        for row in compress(rows, map((0).__eq__, self.valid)):
+            keys[row] = MISSING
+        for row in compress(rows, map(isnan, keys)):
+            keys[row] = MISSING
+        return keys
+
+    # A value that isn't a number matches the cells with exactly that text
+    def matches(self, text):
+        try:
+            target = float(text)
+        except ValueError:
+            texts = self.texts
+            if text not in texts.values():
+                return None
+            return lambda row: texts.get(row) == text
+        values = self.values
+        valid = self.valid
+        return lambda row: valid[row] and values[row] == target
+
+    def valid_values(self, rows=None):
+        values = self.values
+        valid = self.valid
+        if rows is None:
+            if valid.count(0) == 0:
+                return values
+            rows = range(len(values))
+        return array('d', (values[row] for row in rows if valid[row]))
+
+    def nbytes(self):
+        size = self.values.itemsize * len(self.values) + len(self.valid)
+        if self.texts:
+            size += sys.getsizeof(self.texts) + sum(map(sys.getsizeof, self.texts.values()))
+        return size
+
+
+# A text column, dictionary encoded: each distinct string is stored once and
+# rows hold an integer code into that list.
+class TextColumn:
+    kind = 'text'
+
+    # date_format is set when the schema found the column holds dates
+    def __init__(self, name, date_format=None):
+        self.name = name
+        self.date_format = date_format
+        self.codes = array('l')
+        self.categories = []
+        self.lookup = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def append(self, text):
+        code = self.lookup.get(text)
+        if code is None:
+            code = len(self.categories)
+            self.lookup[text] = code
+            self.categories.append(text)
+        self.codes.append(code)
+
+    def truncate(self, length):
+        del self.codes[length:]
+
+    def text(self, row):
+        return self.categories[self.codes[row]]
+
+    # One float per row to sort by: the rank of its distinct value
+    def sort_keys(self):
+        ranks = self.category_ranks()
+        return array('d', map(ranks.__getitem__, self.codes))
+
+    # The sort rank of every distinct value. A date column (see date_format)
+    # sorts by date; otherwise a column whose non-blank values are mostly
+    # numbers (judged on the first TYPE_SAMPLE_ROWS) sorts as numbers ("25"
+    # before "100"), mostly ISO dates as dates, anything else as text. Blank
+    # values and ones that don't parse go last; equal values get equal ranks.
+    def category_ranks(self):
+        categories = self.categories
+        filled = [code for code, text in enumerate(categories) if not is_blank(text)]
+        typed = categories
+        if self.date_format is not None:
+            typed = [parse_day(text.strip(), self.date_format) for text in categories]
+        else:
+            sample = [categories[code] for code in filled[:TYPE_SAMPLE_ROWS]]
+            for parse in (to_number, parse_date):
+                if sum(parse(text) is not None for text in sample) * 2 > len(sample):
+                    typed = [parse(text) for text in categories]
+                    break
+
+        # NaN equals nothing, so it can't be ranked either
+        ordered = [code for code in filled if typed[code] is not None and typed[code] == typed[code]]
+        ordered.sort(key=typed.__getitem__)
+        ranks = array('d', [MISSING]) * len(categories)
+        rank = -1
+        for position, code in enumerate(ordered):
+            if position == 0 or typed[code] != typed[ordered[position - 1]]:
+                rank += 1
+            ranks[code] = rank
+        return ranks
+
+    def matches(self, text):
+        code = self.lookup.get(text)
+        if code is None:
+            return None
+        codes = self.codes
+        return lambda row: codes[row] == code
+
+    # Whole Python objects: each category's str, its list slot and lookup
+    # entry, and the int objects of the codes past the small-int cache
+    def nbytes(self):
+        categories = self.categories
+        size = self.codes.itemsize * len(self.codes) + sys.getsizeof(categories) + sys.getsizeof(self.lookup)
+        size += sum(map(sys.getsizeof, categories))
+        size += max(0, len(categories) - SMALL_INTS) * sys.getsizeof(SMALL_INTS)
+        return size
+
+
+def parse_date(text):
+    return parse_day(text.strip())
+
+
+# Row numbers (counted from 1) of the first DIAGNOSTIC_SAMPLE_ROWS of `rows`
+# whose flag is true; file_rows maps table rows to file rows (see Table)
+def first_rows(rows, flags, file_rows=None):
+    found = islice(compress(rows, flags), DIAGNOSTIC_SAMPLE_ROWS)
+    if file_rows is not None:
+        found = map(file_rows.__getitem__, found)
+    return [row + 1 for row in found]
+
+
+# A whole CSV file held column by column.
+# `end` is how many bytes of the file were read and `check` their
+# MappedCSV.prefix_check, so rows appended later can be added with
+# extend_table. end is None when the file didn't end on a finished line.
+# `schema` is the csv_schema.Schema the columns were typed from.
+# `file_rows` holds the row number in the file of every table row when parts
+# of the file were skipped (see csv_columnar), None when rows are file rows.
+class Table:
+    def __init__(self, header, columns, row_count, end=None, check=None, schema=None, file_rows=None):
+        self.header = header
+        self.columns = columns
+        self.row_count = row_count
+        self.end = end
+        self.check = check
+        self.schema = schema
+        self.file_rows = file_rows
+        # DateIndex per column name, built by date_index when first needed
+        self.date_indexes = {}
+
+    def column(self, name):
+        return self.columns[name]
+
+    def nbytes(self):
+        size = sum(column.nbytes() for column in self.columns.values()) + sum(index.nbytes() for index in self.date_indexes.values())
+        if self.file_rows is not None:
+            size += self.file_rows.itemsize * len(self.file_rows)
+        return size
+
+    def file_row(self, row):
+        return row if self.file_rows is None else self.file_rows[row]
+
+    # Row numbers whose cell in `column_name` equals `value`, or None for all rows
+    def filter_rows(self, column_name, value):
+        predicate = self.columns[column_name].matches(value)
+        if predicate is None:
+            return array('l')
+        return array('l', (row for row in range(self.row_count) if predicate(row)))
+
+    # `rows` (None for all) ordered by the column: numbers, dates or text, see sort_keys
+    def sort_rows(self, rows, column_name, memory_budget=None, progress=None):
+        return sorted_rows(rows, self.columns[column_name].sort_keys(), memory_budget, progress)
+
+    # Just the first k rows of that order
+    def top_rows(self, rows, column_name, k):
+        return top_rows(rows, self.columns[column_name].sort_keys(), k)
+
+    # Cells that aren't numbers are skipped and, with `diagnostics`, counted there
+    def column_stats(self, column_name, rows=None, diagnostics=None):
+        column = self.columns[column_name]
+        stats = ColumnStats()
+        for value in column.valid_values(rows):
+            stats.add(value)
+        if rows is None:
+            rows = range(self.row_count)
+        skipped = len(rows) - stats.count
+        if diagnostics is not None and skipped:
+            diagnostics.add_many(column_name, NOT_NUMBER, skipped, first_rows(rows, map(not_, map(column.valid.__getitem__, rows)), self.file_rows))
+        return stats
+
+    # One pass over the rows into a GroupStats per distinct value of key_column,
+    # with statistics for the columns in numeric_columns ({column index: name})
+    def group_stats(self, key_column, numeric_columns, rows=None):
+        if rows is None:
+            rows = range(self.row_count)
+        key_text = self.columns[key_column].text
+        buffers = [(i, self.columns[name].values, self.columns[name].valid) for i, name in numeric_columns.items()]
+        groups = {}
+        for row in rows:
+            key = key_text(row)
+            group = groups.get(key)
+            if group is None:
+                if len(groups) >= MAX_GROUPS:
+                    raise ValueError(f"Column '{key_column}' has more than {MAX_GROUPS} distinct values, too many to group by.")
+                group = groups[key] = GroupStats(numeric_columns)
+            group.rows += 1
+            column_stats = group.column_stats
+            for i, values, valid in buffers:
+                if valid[row]:
+                    column_stats[i].add(values[row])
+        return groups
+
+    # Histogram of a numeric column: a min/max pass over the array sets the
+    # bins, then every value is binned in C. None if there is nothing to plot.
+    def histogram(self, column_name, rows=None, bins=HISTOGRAM_BINS):
+        values = self.columns[column_name].valid_values(rows)
+        if not values:
+            return None
+        low, high = min(values), max(values)
+        if not (isfinite(low) and isfinite(high)):
+            finite = array('d', filter(isfinite, values))
+            if not finite:
+                return None
+            low, high = min(finite), max(finite)
+        histogram = Histogram(low, high, bins)
+        histogram.add_values(values)
+        return histogram
+
+    def date_stats(self, column_name, rows=None, date_format=ISO_DATE_FORMAT, diagnostics=None):
+        column = self.columns[column_name]
+        if rows is None:
+            rows = range(self.row_count)
+        stats = DateStats(date_format)
+        if column.kind != 'text':
+            for row in rows:
+                problem = stats.add(column.text(row))
+                if problem is not None and diagnostics is not None:
+                    diagnostics.add(column_name, problem, self.file_row(row) + 1)
+            return stats
+
+        # Count the rows of every distinct string, then parse each string once
+        counts = [0] * len(column.categories)
+        codes = column.codes
+        if isinstance(rows, range) and len(rows) == len(codes):
+            for code in codes:
+                counts[code] += 1
+        else:
+            for row in rows:
+                counts[codes[row]] += 1
+        problems = {MISSING_DATE: bytearray(len(counts)), INVALID_DATE: bytearray(len(counts))}
+        for code, (text, count) in enumerate(zip(column.categories, counts)):
+            if count:
+                problem = stats.add(text, count)
+                if problem is not None:
+                    problems[problem][code] = 1
+        if diagnostics is not None:
+            for problem, skipped in ((MISSING_DATE, stats.missing), (INVALID_DATE, stats.invalid)):
+                if skipped:
+                    flags = problems[problem]
+                    diagnostics.add_many(column_name, problem, skipped, first_rows(rows, map(flags.__getitem__, map(codes.__getitem__, rows)), self.file_rows))
+        return stats
+
+    # The DateIndex of a text column of dates, or None when indexes are off or
+    # the column isn't text. Built on first use and kept with the table.
+    def date_index(self, column_name):
+        if not USE_DATE_INDEX or self.columns[column_name].kind != 'text':
+            return None
+        index = self.date_indexes.get(column_name)
+        if index is None:
+            with profiler.span(f"date index '{column_name}'", self.row_count):
+                index = self.date_indexes[column_name] = DateIndex(self.columns[column_name])
+        return index
+
+
+# The rows of a date column ordered by day number (date.toordinal), so the
+# rows in a date range are found with two binary searches instead of a scan.
+# Cells are read in the column's date format (ISO when it has none), the same
+# way filter expressions read them; rows whose cell isn't a date are left out.
+class DateIndex:
+    def __init__(self, column):
+        date_format = column.date_format or ISO_DATE_FORMAT
+        # A bucket sort: the rows of each distinct string, buckets in day order
+        day_of_code = [parse_day(text, date_format) for text in column.categories]
+        buckets = [[] for _ in day_of_code]
+        for row, code in enumerate(column.codes):
+            buckets[code].append(row)
+        self.rows = array('l')
+        self.days = array('l')
+        dated = [code for code, day in enumerate(day_of_code) if day is not None]
+        for code in sorted(dated, key=day_of_code.__getitem__):
+            self.rows.extend(buckets[code])
+            self.days.extend(array('l', [day_of_code[code]]) * len(buckets[code]))
+
+    # (start, end) in the index of the days between low and high (None for no
+    # bound), each end included or not
+    def range_bounds(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        days = self.days
+        if low is None:
+            start = 0
+        else:
+            start = bisect_left(days, low) if low_inclusive else bisect_right(days, low)
+        if high is None:
+            end = len(days)
+        else:
+            end = bisect_right(days, high) if high_inclusive else bisect_left(days, high)
+        return start, max(start, end)
+
+    # Row numbers from start to end of the index, back in file order
+    def file_order(self, start, end):
+        return array('l', sorted(self.rows[start:end]))
+
+    def nbytes(self):
+        return self.rows.itemsize * len(self.rows) + self.days.itemsize * len(self.days)
+
+
+# Parse a whole file into typed columns. The types come from `schema`, or
+# from sampling the file when none is given (see csv_schema.infer_schema).
+def load_table(filename, progress=None, schema=None):
+    with MappedCSV(filename) as reader:
+        if progress is not None:
+            progress.start(reader.size)
+        header = reader.header
+        if schema is None:
+            schema = infer_schema(reader)
+
+        columns = {}
+        for column in schema.columns:
+            if column.kind == 'numeric':
+                columns[column.name] = NumericColumn(column.name)
+            else:
+                columns[column.name] = TextColumn(column.name, column.date_format)
+
+        # Note where every INDEX_EVERY-th record starts, for the sidecar index
+        offsets = [] if load_index(filename) is None else None
+        records = reader.records(offsets=offsets, every=INDEX_EVERY)
+        row_count = append_rows(columns, header, records, reader, progress)
+        if progress is not None:
+            progress.update(progress.total_bytes)
+        end, check = reader_end(reader)
+
+    if offsets is not None:
+        save_index(filename, reader.size, header, row_count, offsets)
+    return Table(header, columns, row_count, end, check, schema)
+
+
+# Stream rows into the column buffers; returns how many there were
+def append_rows(columns, header, rows, reader, progress=None, rows_before=0):
+    appenders = [columns[name].append for name in header]
+    width = len(header)
+    row_count = rows_before
+    for row in rows:
+        if len(row) < width:
+            row = row + [''] * (width - len(row))
+        for append, text in zip(appenders, row):
+            append(text)
+        row_count += 1
+        if progress is not None and row_count % PROGRESS_EVERY_ROWS == 0:
+            progress.update(reader.position)
+    return row_count - rows_before
+
+
+# (end, check) for a Table read to the end of `reader`
+def reader_end(reader):
+    if reader.size > reader.data_start and reader.data[reader.size - 1] != NEWLINE:
+        # The last line may still be being written, appends can't be picked up from here
+        return None, None
+    return reader.size, reader.prefix_check(reader.size)
+
+
+# Add the rows written to an append-only file since `table` was read, parsing
+# only the new bytes. Returns False and leaves the table as it was when the
+# file is not the old contents plus more rows (truncated, rewritten, or the
+# table's last line was unfinished); the caller then loads the file afresh.
+def extend_table(table, filename, progress=None):
+    if table.end is None:
+        return False
+    with MappedCSV(filename) as reader:
+        if reader.size < table.end or reader.header != table.header or reader.prefix_check(table.end) != table.check:
+            return False
+        if progress is not None:
+            progress.start(reader.size)
+            progress.update(table.end)
+
+        old_end = table.end
+        old_row_count = table.row_count
+        offsets = []
+        # Counting from old_row_count keeps the new index entries on the same grid as the old ones
+        records = reader.records(start=old_end, offsets=offsets, every=INDEX_EVERY, first=old_row_count)
+        try:
+            added = append_rows(table.columns, table.header, records, reader, progress, old_row_count)
+        except Exception:
+            for column in table.columns.values():
+                column.truncate(old_row_count)
+            raise
+        table.row_count = old_row_count + added
+        table.end, table.check = reader_end(reader)
+        table.date_indexes.clear()
+        if progress is not None:
+            progress.update(progress.total_bytes)
+
+    extend_index(filename, old_end, old_row_count, reader.size, table.header, table.row_count, offsets)
+    return True
+
+
+# Rows of a sorted view that are worked out before anything else is sorted
+TOP_K_ROWS = 1000
+
+
+# A window onto the rows of a table, in filtered order when `rows` is given
+# and sorted by sort_column when that is given. Cells are only turned back
+# into text for the rows asked for. Nothing is sorted until a window is asked
+# for; the first TOP_K_ROWS rows come from a top-k. Scrolling past them needs
+# the whole view sorted, which can take long, so window() never does it: the
+# caller checks needs_sort() and runs sort() on a worker thread first.
+class TableView:
+    def __init__(self, table, rows=None, sort_column=None):
+        self.table = table
+        self.header = table.header
+        self.row_numbers = rows
+        self.sort_column = sort_column
+        self.top = None
+
+    def __len__(self):
+        if self.row_numbers is None:
+            return self.table.row_count
+        return len(self.row_numbers)
+
+    # True when showing the first `needed` rows takes the full sort
+    def needs_sort(self, needed):
+        return self.sort_column is not None and needed > TOP_K_ROWS and len(self) > TOP_K_ROWS
+
+    # The full sort (call from a worker thread, not the GUI's); `progress`
+    # follows it and can cancel it
+    def sort(self, progress=None):
+        if self.sort_column is None:
+            return
+        with profiler.span(f"sort by '{self.sort_column}'", len(self)):
+            rows = self.table.sort_rows(self.row_numbers, self.sort_column, progress=progress)
+        # The GUI may read the top rows meanwhile, so they are only dropped once the rows are in place
+        self.row_numbers = rows
+        self.sort_column = None
+        self.top = None
+
+    # Row numbers whose first `needed` entries are in display order
+    def ordered(self, needed):
+        if self.sort_column is not None:
+            if len(self) <= TOP_K_ROWS:
+                # Small enough to sort right away
+                self.sort()
+            elif needed <= TOP_K_ROWS:
+                if self.top is None:
+                    with profiler.span(f"top {TOP_K_ROWS} by '{self.sort_column}'", len(self)):
+                        self.top = self.table.top_rows(self.row_numbers, self.sort_column, TOP_K_ROWS)
+                return self.top
+            else:
+                raise ValueError("The rows are not sorted yet, call sort() first.")
+        if self.row_numbers is None:
+            return range(self.table.row_count)
+        return self.row_numbers
+
+    # Work out the first screens now (call from a worker thread, not the GUI's)
+    def prefetch(self):
+        self.ordered(min(len(self), TOP_K_ROWS))
+
+    # (file row number, cell, cell, ...) for `count` rows from position `start`
+    def window(self, start, count):
+        end = min(start + count, len(self))
+        rows = self.ordered(end)[start:end]
+        columns = [self.table.columns[name] for name in self.header]
+        file_row = self.table.file_row
+        return [(file_row(row) + 1,) + tuple(column.text(row) for column in columns) for row in rows]
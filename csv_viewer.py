@@ -0,0 +1,293 @@
+import tkinter as tk
+from tkinter import ttk
+from tkinter import filedialog
+
+from csv_jobs import BackgroundJob
+
+# Rows shown at once; this is also the number of Treeview items ever created
+VISIBLE_ROWS = 25
+
+# How often the grid checks on a sort running in the background, in ms
+SORT_POLL_MS = 100
+
+
+# Scrollable grid over any number of rows that only ever holds VISIBLE_ROWS
+# Treeview items. The scrollbar is driven by hand: on every scroll the grid
+# asks its view (csv_table.TableView or csv_index.FileView) for just the rows
+# in the window and writes them into the existing items. A sorted view whose
+# full sort is needed (see TableView.needs_sort) is sorted on a background
+# thread first, the grid keeps its rows and says "Sorting..." meanwhile.
+class DataGrid(ttk.Frame):
+    def __init__(self, master, visible_rows=VISIBLE_ROWS):
+        super().__init__(master)
+        self.view = None
+        self.top = 0
+        self.visible_rows = visible_rows
+        self.sort_job = None
+
+        self.tree = ttk.Treeview(self, show="headings", height=visible_rows)
+        self.tree.grid(row=0, column=0, columnspan=4, sticky=tk.NSEW)
+        self.scroll_y = ttk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+        self.scroll_y.grid(row=0, column=4, sticky="ns")
+        self.items = [self.tree.insert("", tk.END, values=()) for _ in range(visible_rows)]
+
+        # Jump to Row Entry and Button
+        self.goto_label = ttk.Label(self, text="Go to row:")
+        self.goto_label.grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        self.goto_entry = ttk.Entry(self, width=12)
+        self.goto_entry.grid(row=1, column=1, sticky=tk.W, padx=5, pady=5)
+        self.goto_entry.bind("<Return>", lambda event: self.goto_row())
+        self.goto_button = ttk.Button(self, text="Go", command=self.goto_row)
+        self.goto_button.grid(row=1, column=2, sticky=tk.W, padx=5, pady=5)
+        self.status_label = ttk.Label(self, text="No data")
+        self.status_label.grid(row=1, column=3, sticky=tk.E, padx=5, pady=5)
+
+        self.columnconfigure(3, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        # Mouse wheel (Windows/macOS send <MouseWheel>, X11 sends buttons 4 and 5)
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll_to(self.top - (1 if event.delta > 0 else -1) * 3))
+        self.tree.bind("<Button-4>", lambda event: self.scroll_to(self.top - 3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_to(self.top + 3))
+
+    def set_view(self, view):
+        self.view = view
+        self.top = 0
+        # A sort still running for the old view is not needed any more
+        if self.sort_job is not None:
+            self.sort_job.cancel()
+            self.sort_job = None
+        columns = ["Row"] + list(view.header) if view is not None else []
+        self.tree.configure(columns=columns)
+        for column in columns:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=100, stretch=False)
+        self.refresh()
+
+    def on_scroll(self, action, amount, unit=None):
+        if self.view is None:
+            return
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.view)))
+        elif unit == "pages":
+            self.scroll_to(self.top + int(amount) * self.visible_rows)
+        else:
+            self.scroll_to(self.top + int(amount))
+
+    def scroll_to(self, top):
+        if self.view is None:
+            return
+        top = max(0, min(top, len(self.view) - self.visible_rows))
+        if top != self.top:
+            self.top = top
+            self.refresh()
+
+    def goto_row(self):
+        try:
+            row = int(self.goto_entry.get())
+        except ValueError:
+            return
+        self.scroll_to(row - 1)
+
+    def start_sort(self):
+        if self.sort_job is None:
+            self.sort_job = BackgroundJob(self.view.sort).start()
+            self.after(SORT_POLL_MS, self.poll_sort, self.sort_job)
+        self.status_label.config(text=f"Sorting {len(self.view)} rows...")
+
+    def poll_sort(self, job):
+        if job is not self.sort_job:
+            return
+        if not job.done:
+            self.status_label.config(text=f"Sorting {len(self.view)} rows... {job.progress.percent():.0f}%")
+            self.after(SORT_POLL_MS, self.poll_sort, job)
+            return
+        self.sort_job = None
+        if job.error is not None:
+            print(f"Error: Could not sort the rows. {job.error}\n")
+            self.status_label.config(text="Sorting failed")
+            return
+        self.refresh()
+
+    def refresh(self):
+        needs_sort = getattr(self.view, 'needs_sort', None)
+        if needs_sort is not None and needs_sort(self.top + self.visible_rows):
+            self.start_sort()
+            return
+        rows = self.view.window(self.top, self.visible_rows) if self.view is not None else []
+        for position, item in enumerate(self.items):
+            if position < len(rows):
+                self.tree.item(item, values=rows[position])
+                self.tree.move(item, "", position)
+            else:
+                self.tree.detach(item)
+
+        total = len(self.view) if self.view is not None else 0
+        if total:
+            self.scroll_y.set(self.top / total, min(1.0, (self.top + self.visible_rows) / total))
+            self.status_label.config(text=f"Rows {self.top + 1}-{self.top + len(rows)} of {total}")
+        else:
+            self.scroll_y.set(0.0, 1.0)
+            self.status_label.config(text="No data")
+
+
+# Rows inserted per idle callback when filling the results tree
+INSERT_CHUNK_ROWS = 200
+
+
+# Fills a Treeview with rows that were built off-thread, a chunk at a time
+# from after_idle callbacks so the window keeps handling events in between.
+# With detach=True the tree is taken off screen while it fills, which saves
+# Tk from re-laying it out after every chunk.
+class BatchInserter:
+    def __init__(self, tree, chunk_rows=INSERT_CHUNK_ROWS, detach=False):
+        self.tree = tree
+        self.chunk_rows = chunk_rows
+        self.detach = detach
+        self.rows = []
+        self.position = 0
+        self.pending = None
+        self.on_done = None
+
+    def clear(self):
+        self.cancel()
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+
+    def cancel(self):
+        if self.pending is not None:
+            self.tree.after_cancel(self.pending)
+            self.pending = None
+            self.finish()
+
+    # rows: list of (values, tag), or (values, tag, child rows) for an
+    # expandable row whose (values, tag) children start out collapsed
+    def fill(self, rows, on_done=None):
+        self.cancel()
+        self.rows = rows
+        self.position = 0
+        self.on_done = on_done
+        if self.detach:
+            self.tree.grid_remove()
+        self.pending = self.tree.after_idle(self.insert_chunk)
+
+    def insert_chunk(self):
+        insert = self.tree.insert
+        end = min(self.position + self.chunk_rows, len(self.rows))
+        for row in self.rows[self.position:end]:
+            item = insert("", tk.END, values=row[0], tags=(row[1],))
+            if len(row) > 2:
+                for values, tag in row[2]:
+                    insert(item, tk.END, values=values, tags=(tag,))
+        self.position = end
+        if end < len(self.rows):
+            self.pending = self.tree.after_idle(self.insert_chunk)
+            return
+        self.pending = None
+        self.finish()
+        if self.on_done is not None:
+            self.on_done()
+
+    def finish(self):
+        if self.detach:
+            self.tree.grid()
+
+
+# Table of the stage timings of the last job (see csv_profile), with a switch
+# for per-stage memory tracing and an export to a Chrome trace file.
+class PerformancePanel(ttk.Frame):
+    def __init__(self, master, profiler):
+        super().__init__(master)
+        self.profiler = profiler
+
+        self.tree = ttk.Treeview(self, columns=("Stage", "Time (ms)", "Rows", "Rows/s", "Peak memory (MB)"), show="headings")
+        self.tree.grid(row=0, column=0, columnspan=3, sticky=tk.NSEW)
+        for column in ("Stage", "Time (ms)", "Rows", "Rows/s", "Peak memory (MB)"):
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=200 if column == "Stage" else 100)
+        self.scroll_y = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.scroll_y.grid(row=0, column=3, sticky="ns")
+        self.tree.configure(yscrollcommand=self.scroll_y.set)
+
+        # tracemalloc makes parsing several times slower, so it is off unless asked for
+        self.trace_memory_var = tk.BooleanVar(value=profiler.memory_source() == "traced")
+        self.trace_memory_check = ttk.Checkbutton(self, text="Trace memory per stage (slower)", variable=self.trace_memory_var,
+                                                  command=lambda: profiler.set_trace_memory(self.trace_memory_var.get()))
+        self.trace_memory_check.grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        self.export_button = ttk.Button(self, text="Export Trace...", command=self.export_trace)
+        self.export_button.grid(row=1, column=2, sticky=tk.E, padx=5, pady=5)
+
+        self.columnconfigure(1, weight=1)
+        self.rowconfigure(0, weight=1)
+
+    def refresh(self):
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        for span in self.profiler.finished_spans():
+            seconds = span.duration()
+            rows = "" if span.rows is None else span.rows
+            rate = f"{span.rows / seconds:,.0f}" if span.rows and seconds > 0 else ""
+            memory = "" if span.peak_memory is None else f"{span.peak_memory / 2 ** 20:.1f}"
+            self.tree.insert("", tk.END, values=("  " * span.depth + span.name, f"{seconds * 1000:.1f}", rows, rate, memory))
+
+    def export_trace(self):
+        filename = filedialog.asksaveasfilename(title="Export performance trace", defaultextension=".json",
+                                                filetypes=(("Chrome trace (JSON)", "*.json"), ("all files", "*.*")))
+        if not filename:
+            return
+        try:
+            self.profiler.save_trace(filename)
+        except OSError as e:
+            print(f"Error: Could not write '{filename}'. {e}\n")
+
+
+# The cells the last analysis had to skip (see csv_stats.Diagnostics): one
+# line per column and kind of problem with a few example rows, and a button
+# to append that summary to a log file.
+class DiagnosticsPanel(ttk.Frame):
+    def __init__(self, master):
+        super().__init__(master)
+        self.diagnostics = None
+        self.source = None
+
+        self.tree = ttk.Treeview(self, columns=("Column", "Problem", "Rows skipped", "Example rows"), show="headings")
+        self.tree.grid(row=0, column=0, columnspan=3, sticky=tk.NSEW)
+        for column in ("Column", "Problem", "Rows skipped", "Example rows"):
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=300 if column == "Example rows" else 120)
+        self.scroll_y = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.scroll_y.grid(row=0, column=3, sticky="ns")
+        self.tree.configure(yscrollcommand=self.scroll_y.set)
+
+        self.total_label = ttk.Label(self, text="No problems found")
+        self.total_label.grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        self.save_button = ttk.Button(self, text="Save Log...", command=self.save_log, state=tk.DISABLED)
+        self.save_button.grid(row=1, column=2, sticky=tk.E, padx=5, pady=5)
+
+        self.columnconfigure(1, weight=1)
+        self.rowconfigure(0, weight=1)
+
+    def show(self, diagnostics, source):
+        self.diagnostics = diagnostics
+        self.source = source
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        for column, problem, count, rows in diagnostics.entries():
+            examples = ", ".join(map(str, rows)) + (", ..." if count > len(rows) else "")
+            self.tree.insert("", tk.END, values=(column, problem, count, examples))
+        total = diagnostics.total()
+        self.total_label.config(text=f"{total} cell(s) skipped" if total else "No problems found")
+        self.save_button.config(state=tk.NORMAL if total else tk.DISABLED)
+
+    def save_log(self):
+        filename = filedialog.asksaveasfilename(title="Append warnings to log", defaultextension=".log",
+                                                filetypes=(("Log files", "*.log"), ("all files", "*.*")))
+        if not filename:
+            return
+        try:
+            self.diagnostics.write_log(filename, self.source)
+        except OSError as e:
+            print(f"Error: Could not write '{filename}'. {e}\n")
@@ -0,0 +1,174 @@
+import csv
+import pickle
+import random
+import re
+from array import array
+from datetime import date, timedelta
+from itertools import compress
+
+import pytest
+
+from csv_filter import FilterError, compile_filter
+from csv_table import load_table
+
+# Filter expressions are evaluated three ways: as a column mask over a parsed
+# table, as a per-row test over streamed rows, and from a DateIndex for narrow
+# date ranges. All three must pick the same rows.
+# Run with pytest (python -m pytest test_csv_filter.py).
+
+HEADER = ['Name', 'Age', 'City', 'Date', 'Salary']
+CITIES = ['Chicago', 'Houston', 'New York', '25', '100']
+FIRST_DATE = date(2020, 1, 1)
+
+
+def random_rows(count, seed=3):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        r = rng.random()
+        age = '' if r < 0.05 else 'N/A' if r < 0.08 else str(rng.randint(18, 70))
+        city = '' if rng.random() < 0.05 else rng.choice(CITIES)
+        r = rng.random()
+        day = ' ' if r < 0.03 else 'someday' if r < 0.04 else (FIRST_DATE + timedelta(days=rng.randint(0, 99))).isoformat()
+        salary = f'{rng.uniform(20000, 90000):.2f}'
+        rows.append([f'Person {i}', age, city, day, salary])
+    return rows
+
+
+@pytest.fixture(scope='module')
+def data(tmp_path_factory):
+    filename = tmp_path_factory.mktemp('filter') / 'people.csv'
+    rows = random_rows(2000)
+    with open(filename, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    table = load_table(str(filename))
+    return table, rows
+
+
+def compiled(table, text):
+    numeric_flags = [table.column(name).kind == 'numeric' for name in table.header]
+    return compile_filter(text, table.header, numeric_flags, [column.date_format for column in table.schema.columns])
+
+
+EXPRESSIONS = [
+    'Age > 30',
+    'Age >= 30 and Age <= 40',
+    'Age = 30 or Age == 31',
+    'Age != 30',
+    'Age in (20, 30, 40)',
+    'Age not in [20, 30, 40]',
+    'Age between 25 and 35',
+    'Age not between 25 and 35',
+    'Age is null',
+    'Age is not null',
+    'not Age is null',
+    'not (Age > 30 and City = Chicago)',
+    'City = "New York"',
+    'City != Chicago',
+    'City in (Chicago, Houston)',
+    'City < Houston',
+    'City > 30',
+    'City between 20 and 50',
+    'City matches "^(C|H)"',
+    'City ~ "o"',
+    'City not matches "o"',
+    'City is null',
+    'Salary between 40000 and 60000 or Name matches "7$"',
+    'Date = 2020-01-05',
+    'Date < 2020-01-04',
+    'Date >= 2020-04-05',
+    'Date between 2020-02-01 and 2020-02-05',
+    'Date between 2020-02-01 and 2020-02-05 and Age > 40',
+    'Age > 40 and Date > 2020-04-01',
+    'Date > 2020-02-01',
+    'Date is null',
+    'Date matches "-02-"',
+    '`Name` = "Person 7"',
+]
+
+
+@pytest.mark.parametrize('text', EXPRESSIONS)
+def test_mask_row_test_and_index_agree(data, text):
+    table, rows = data
+    expression = compiled(table, text)
+    by_mask = list(compress(range(table.row_count), expression.mask(table)))
+    test = expression.row_test()
+    by_row = [i for i, row in enumerate(rows) if test(row)]
+    assert by_mask == by_row
+    assert list(expression.filter_rows(table)) == by_mask
+
+    # Out of a subset of the rows, in the subset's order
+    subset = array('l', range(table.row_count - 1, -1, -3))
+    assert list(expression.filter_rows(table, subset)) == [i for i in subset if test(rows[i])]
+
+
+def test_narrow_date_ranges_use_the_date_index(data):
+    table, rows = data
+    for text in ('Date = 2020-01-05', 'Date between 2020-02-01 and 2020-02-05 and Age > 40', 'Age > 40 and Date < 2020-01-04'):
+        assert compiled(table, text).root.index_rows(table) is not None, text
+    # A wide range is cheaper to scan
+    assert compiled(table, 'Date > 2020-02-01').root.index_rows(table) is None
+
+
+def test_missing_values_only_match_is_null(data):
+    table, rows = data
+    ages = [row[1] for row in rows]
+    for text in ('Age != 30', 'Age not in (30)', 'Age not between 30 and 30', 'Age matches ""'):
+        picked = compiled(table, text).filter_rows(table)
+        assert all(ages[i] not in ('', 'N/A') for i in picked), text
+    nulls = list(compiled(table, 'Age is null').filter_rows(table))
+    assert nulls == [i for i, age in enumerate(ages) if age in ('', 'N/A')]
+    assert nulls
+    # "not" is taken literally: it does pick the missing values
+    assert set(nulls) <= set(compiled(table, 'not Age > 0').filter_rows(table))
+
+
+@pytest.mark.parametrize('text, message', [
+    ('', 'empty'),
+    ('Age >', 'end of expression'),
+    ('Age > 30 and', 'end of expression'),
+    ('(Age > 30', 'end of expression'),
+    ('Age > 30)', "Unexpected ')'"),
+    ('Height > 3', "Column 'Height' not found"),
+    ('Age > thirty', 'is not a number'),
+    ('Age in (30, x)', 'is not a number'),
+    ('Age not = 30', "Expected 'in', 'between' or 'matches'"),
+    ('Age between 3 or 5', "Expected 'and'"),
+    ('Age is 30', "Expected 'null'"),
+    ('Name matches "("', 'Bad regular expression'),
+    ('Age > 30 & Age < 40', "Unexpected '&'"),
+    ('`Age > 30', "Unexpected character '`' at position 1"),
+    ('= 30', 'Expected a column name'),
+    ('Age = (', 'Expected a value'),
+])
+def test_parse_errors(data, text, message):
+    table, rows = data
+    with pytest.raises(FilterError, match=re.escape(message)):
+        compiled(table, text)
+
+
+def test_workers_get_an_equal_filter(data):
+    table, rows = data
+    expression = compiled(table, 'Age > 30 and Date < 2020-02-01')
+    copy = pickle.loads(pickle.dumps(expression))
+    assert copy == expression
+    test = copy.row_test()
+    assert [i for i, row in enumerate(rows) if test(row)] == list(expression.filter_rows(table))
+
+
+# may_match must never rule out a block of rows that has a match
+def test_may_match_never_skips_a_match(data):
+    table, rows = data
+    for text in ('Salary > 85000', 'Salary < 21000', 'Salary = 50000', 'Salary in (1, 2)', 'Salary between 30000 and 31000',
+                 'Salary > 85000 or City = Chicago', 'not Salary > 50000', 'Salary != 5'):
+        expression = compiled(table, text)
+        test = expression.row_test()
+        for start in range(0, len(rows), 50):
+            block = rows[start:start + 50]
+            salaries = [float(row[4]) for row in block]
+            if not expression.may_match({'Salary': (min(salaries), max(salaries))}):
+                assert not any(map(test, block)), (text, start)
+    assert not compiled(table, 'Salary > 100').may_match({'Salary': (1, 50)})
+    assert not compiled(table, 'Salary between 60 and 70').may_match({'Salary': (1, 50)})
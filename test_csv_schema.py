@@ -0,0 +1,85 @@
+import csv
+
+import pytest
+
+from csv_schema import SAMPLE_ROWS, TYPE_SHARE, infer_column, read_schema
+
+# Column types come from a sample of the head, the middle and the tail of a
+# file. Run with pytest (python -m pytest test_csv_schema.py).
+
+
+def write_rows(filename, header, rows):
+    with open(filename, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+# At least TYPE_SHARE of the non-blank cells have to parse; blanks don't count
+@pytest.mark.parametrize('numbers, others, blanks, kind', [
+    (95, 5, 0, 'numeric'),
+    (94, 6, 0, 'text'),
+    (100, 0, 0, 'numeric'),
+    (19, 1, 500, 'numeric'),
+    (18, 2, 500, 'text'),
+    (0, 0, 50, 'text'),
+])
+def test_type_share(numbers, others, blanks, kind):
+    assert TYPE_SHARE == 0.95
+    cells = [str(i * 1.5) for i in range(numbers)] + ['N/A'] * others + [' '] * blanks
+    column = infer_column('Value', cells)
+    assert column.kind == kind
+    assert column.null_rate == pytest.approx(blanks / len(cells))
+
+
+def test_numeric_range_leaves_out_infinities():
+    column = infer_column('Value', ['3', '-2', 'inf', '7.5', '-inf'])
+    assert column.kind == 'numeric'
+    assert (column.minimum, column.maximum) == (-2.0, 7.5)
+
+
+@pytest.mark.parametrize('cells, date_format', [
+    (['2021-03-04'] * 95 + ['soon'] * 5, '%Y-%m-%d'),
+    (['2021/03/04'] * 20, '%Y/%m/%d'),
+    (['13/02/2020', '01/02/2020'] * 10, '%d/%m/%Y'),
+    (['02/13/2020', '02/01/2020'] * 10, '%m/%d/%Y'),
+    (['04.03.2021'] * 20, '%d.%m.%Y'),
+    (['2021-03-04 10:00:00'] * 20, '%Y-%m-%d %H:%M:%S'),
+])
+def test_date_formats(cells, date_format):
+    column = infer_column('Date', cells)
+    assert (column.kind, column.date_format) == ('date', date_format)
+
+
+def test_too_few_dates_is_text():
+    assert infer_column('Date', ['2021-03-04'] * 94 + ['soon'] * 6).kind == 'text'
+
+
+# Only text far from the head: a sample of the head alone would call these numeric
+@pytest.mark.parametrize('where', ['middle', 'tail'])
+def test_middle_and_tail_are_sampled(tmp_path, where):
+    filename = tmp_path / 'late.csv'
+    count = 50000
+    # Rows of one length, so the middle byte is the middle row
+    odd = range(count // 2, count // 2 + 100) if where == 'middle' else range(count - 100, count)
+    rows = [[f'{i:06d}', 'late tx' if i in odd else f'{i * 2:07d}'] for i in range(count)]
+    write_rows(filename, ['Id', 'Late'], rows)
+    schema = read_schema(str(filename))
+    assert schema.column('Id').kind == 'numeric'
+    assert schema.column('Late').kind == 'text'
+    assert schema.sampled_rows <= 3 * SAMPLE_ROWS
+
+
+def test_small_files_are_sampled_once(tmp_path):
+    filename = tmp_path / 'small.csv'
+    write_rows(filename, ['Id'], [[i] for i in range(SAMPLE_ROWS + 100)])
+    assert read_schema(str(filename)).sampled_rows == SAMPLE_ROWS + 100
+
+
+# A seek into the middle of a quoted field that spans lines must not throw the types off
+def test_multiline_fields_in_the_middle(tmp_path):
+    filename = tmp_path / 'notes.csv'
+    rows = [[i, 'first line\n' * 30 + f'{i},{i},{i}', i / 4] for i in range(20000)]
+    write_rows(filename, ['Id', 'Note', 'Score'], rows)
+    schema = read_schema(str(filename))
+    assert [column.kind for column in schema.columns] == ['numeric', 'text', 'numeric']
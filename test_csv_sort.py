@@ -0,0 +1,110 @@
+import csv
+import random
+from array import array
+
+import pytest
+
+from csv_jobs import JobCancelled, Progress
+from csv_sort import MISSING, external_sort, sorted_rows, top_rows
+from csv_table import TOP_K_ROWS, TableView, load_table
+
+# Sorting is done on row numbers by a float key per row; every way of doing
+# it (in memory, in runs spilled to disk and merged, or just the top k) must
+# give the order a stable sorted() gives.
+# Run with pytest (python -m pytest test_csv_sort.py).
+
+
+def random_keys(count, seed=5):
+    rng = random.Random(seed)
+    # Few distinct keys, so there are plenty of ties to keep in file order
+    return array('d', [MISSING if rng.random() < 0.05 else float(rng.randint(-50, 50)) for _ in range(count)])
+
+
+def expected(rows, keys):
+    return sorted(rows, key=keys.__getitem__)
+
+
+@pytest.mark.parametrize('run_rows', [1, 7, 100, 5000])
+def test_external_sort_is_sorted_and_stable(run_rows):
+    keys = random_keys(3000)
+    rows = array('l', range(len(keys)))
+    assert list(external_sort(rows, keys, run_rows)) == expected(rows, keys)
+    # A subset, in an order of its own
+    subset = array('l', range(len(keys) - 1, -1, -2))
+    assert list(external_sort(subset, keys, run_rows)) == expected(subset, keys)
+
+
+def test_sorted_rows_spills_over_budget():
+    keys = random_keys(150000)
+    progress = Progress()
+    rows = sorted_rows(None, keys, memory_budget=0, progress=progress)
+    assert list(rows) == expected(range(len(keys)), keys)
+    # Sorted into runs, then merged
+    assert progress.total_bytes == 2 * len(keys)
+    assert progress.percent() == 100.0
+
+
+def test_cancelled_sort_stops():
+    keys = random_keys(150000)
+    progress = Progress()
+    progress.cancel()
+    with pytest.raises(JobCancelled):
+        sorted_rows(None, keys, memory_budget=0, progress=progress)
+
+
+@pytest.mark.parametrize('k', [0, 1, 10, 999, 3000, 5000])
+def test_top_rows_are_the_head_of_the_full_sort(k):
+    keys = random_keys(3000)
+    assert list(top_rows(None, keys, k)) == expected(range(len(keys)), keys)[:k]
+    subset = array('l', range(0, len(keys), 3))
+    assert list(top_rows(subset, keys, k)) == expected(subset, keys)[:k]
+
+
+def write_column(filename, name, cells):
+    with open(filename, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow([name, 'Row'])
+        writer.writerows([cell, i] for i, cell in enumerate(cells))
+
+
+def sorted_cells(tmp_path, cells):
+    filename = tmp_path / 'sort.csv'
+    write_column(filename, 'Cell', cells)
+    table = load_table(str(filename))
+    column = table.column('Cell')
+    return [column.text(row) for row in table.sort_rows(None, 'Cell')]
+
+
+# Numbers sort as numbers, also in a text column; blanks and cells that don't
+# parse go last, in file order
+def test_sort_is_type_aware(tmp_path):
+    assert sorted_cells(tmp_path, ['100', '25', '', '3.5', 'x', '-1', '25'] + [str(i) for i in range(40)]) == \
+        sorted(['100', '25', '3.5', '-1', '25'] + [str(i) for i in range(40)], key=float) + ['', 'x']
+    assert sorted_cells(tmp_path, ['2021-03-01', '2020-12-31', ' ', '2021-01-15', 'soon'] * 10)[:30] == \
+        ['2020-12-31'] * 10 + ['2021-01-15'] * 10 + ['2021-03-01'] * 10
+    assert sorted_cells(tmp_path, ['pear', 'Apple', 'apple', '', 'fig']) == ['Apple', 'apple', 'fig', 'pear', '']
+    # A numeric column: NaN and blanks after every number, in file order
+    assert sorted_cells(tmp_path, ['3', 'nan', '1', '', '2'] * 30)[:92] == ['1'] * 30 + ['2'] * 30 + ['3'] * 30 + ['nan', '']
+
+
+def test_view_sorts_top_k_then_in_full(tmp_path):
+    filename = tmp_path / 'view.csv'
+    rng = random.Random(9)
+    cells = [str(rng.randint(0, 500)) for _ in range(TOP_K_ROWS * 3)]
+    write_column(filename, 'Cell', cells)
+    table = load_table(str(filename))
+    order = sorted(range(len(cells)), key=lambda row: int(cells[row]))
+
+    view = TableView(table, sort_column='Cell')
+    assert not view.needs_sort(TOP_K_ROWS)
+    assert [row[0] - 1 for row in view.window(0, 50)] == order[:50]
+    # Past the top k the view has to be sorted first, and never is from window()
+    assert view.needs_sort(TOP_K_ROWS + 1)
+    with pytest.raises(ValueError):
+        view.window(TOP_K_ROWS, 10)
+
+    progress = Progress()
+    view.sort(progress)
+    assert progress.percent() == 100.0
+    assert not view.needs_sort(len(cells))
+    assert [row[0] - 1 for row in view.window(TOP_K_ROWS, 2 * TOP_K_ROWS)] == order[TOP_K_ROWS:]
@@ -0,0 +1,257 @@
+import math
+import random
+import statistics
+from array import array
+from collections import Counter, defaultdict
+
+import pytest
+
+import csv_stats
+from csv_stats import EXACT_DISTINCT_LIMIT, HISTOGRAM_BINS, ColumnStats, Histogram, ModeSketch, StreamingAnalysis
+
+# The aggregates are built in one pass and merged across chunks (parallel
+# runs, appends), so a merge must give what a single pass over all the rows
+# gives. Run with pytest (python -m pytest test_csv_stats.py).
+
+HEADER = ['City', 'Age', 'Salary']
+
+
+def people(count, seed=11):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        city = rng.choice(['Chicago', 'Houston', '', 'Phoenix'])
+        age = rng.choice(['30', '30.0', '41', '', 'N/A', '52', '7e1'])
+        salary = '' if rng.random() < 0.05 else str(rng.randint(20, 90) * 1000)
+        rows.append([city, age, salary])
+    return rows
+
+
+def analysis(rows, group_index, group_numeric):
+    result = StreamingAnalysis(HEADER, [2], group_index=group_index, group_numeric=group_numeric)
+    result.add_rows(rows)
+    return result
+
+
+# {key: (rows, count, sum, median, mode)} of the Salary column
+def groups(result):
+    return {key: (group.rows, group.column_stats[2].count, group.column_stats[2].total, group.column_stats[2].median(), group.column_stats[2].mode())
+            for key, group in result.groups.items()}
+
+
+def plain_groups(rows, key):
+    salaries = defaultdict(list)
+    counts = defaultdict(int)
+    for row in rows:
+        counts[key(row)] += 1
+        if row[2]:
+            salaries[key(row)].append(float(row[2]))
+    expected = {}
+    for k, values in salaries.items():
+        values.sort()
+        middle = len(values) // 2
+        median = values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+        expected[k] = (counts[k], len(values), sum(values), median)
+    return expected
+
+
+def test_group_by_text_column():
+    rows = people(2000)
+    found = {key: value[:4] for key, value in groups(analysis(rows, 0, False)).items()}
+    assert found == plain_groups(rows, lambda row: row[0])
+
+
+def test_group_by_numeric_column_joins_equal_numbers():
+    rows = people(2000)
+
+    def key(row):
+        if row[1] in ('', 'N/A'):
+            return row[1]
+        return csv_stats.number_text(float(row[1]))
+    found = {key: value[:4] for key, value in groups(analysis(rows, 1, True)).items()}
+    assert found == plain_groups(rows, key)
+    # "30" and "30.0" are one group, "7e1" is 70
+    assert {'30', '70', '41', '52', '', 'N/A'} == set(found)
+
+
+@pytest.mark.parametrize('parts', [2, 3, 7])
+def test_merged_groups_equal_a_single_pass(parts):
+    rows = people(3000)
+    whole = analysis(rows, 0, False)
+    size = len(rows) // parts + 1
+    merged = analysis(rows[:size], 0, False)
+    for start in range(size, len(rows), size):
+        merged.merge(analysis(rows[start:start + size], 0, False))
+    assert groups(merged).keys() == groups(whole).keys()
+    for key, value in groups(whole).items():
+        assert groups(merged)[key][:2] == value[:2]
+        assert groups(merged)[key][2:] == pytest.approx(value[2:])
+
+
+def test_too_many_groups_is_an_error(monkeypatch):
+    monkeypatch.setattr(csv_stats, 'MAX_GROUPS', 5)
+    rows = [[f'City {i}', '1', '1'] for i in range(6)]
+    with pytest.raises(ValueError, match='too many to group by'):
+        analysis(rows, 0, False)
+    # Also when the keys only add up to too many once chunks are merged
+    first = analysis(rows[:3], 0, False)
+    with pytest.raises(ValueError, match='too many to group by'):
+        first.merge(analysis(rows[3:], 0, False))
+
+
+def histogram_values(count, seed=13):
+    rng = random.Random(seed)
+    values = [rng.uniform(0, 100) for _ in range(count)]
+    # Values far outside the range the histogram is made for, and the edges
+    values += [rng.uniform(-5000, 20000) for _ in range(count // 50)]
+    values += [0.0, 100.0, 100.0, 20000.0]
+    rng.shuffle(values)
+    return values
+
+
+# The bin of each value worked out from the final grid
+def binned(histogram, values):
+    counts = defaultdict(int)
+    for value in values:
+        if value == histogram.high:
+            counts[histogram.top] += 1
+        else:
+            counts[math.floor((value - histogram.origin) / histogram.width)] += 1
+    return dict(counts)
+
+
+def test_histogram_within_its_range():
+    histogram = Histogram(0, 100)
+    values = [i / 10 for i in range(1001)]
+    for value in values:
+        histogram.add(value)
+    edges, counts = histogram.bins_and_counts()
+    assert edges == pytest.approx([10.0 * j for j in range(11)])
+    # The top bin is closed, like numpy's
+    assert counts == [100] * 9 + [101]
+
+
+def test_histogram_widens_to_fit_outliers():
+    values = histogram_values(5000)
+    histogram = Histogram(0, 100)
+    for value in values:
+        histogram.add(value)
+    assert histogram.width > 10.0
+    assert histogram.width / 10.0 == 2 ** round(math.log2(histogram.width / 10.0))
+    assert max(histogram.counts) - min(histogram.counts) < 2 * HISTOGRAM_BINS
+    assert dict(histogram.counts) == binned(histogram, values)
+    assert histogram.total() == len(values)
+
+
+def test_add_values_equals_add():
+    values = histogram_values(5000)
+    one_by_one = Histogram(0, 100)
+    for value in values:
+        one_by_one.add(value)
+    at_once = Histogram(0, 100)
+    at_once.add_values(array('d', values))
+    assert (at_once.width, dict(at_once.counts)) == (one_by_one.width, dict(one_by_one.counts))
+
+
+@pytest.mark.parametrize('parts', [2, 3, 10])
+def test_merged_histograms_equal_a_single_pass(parts):
+    values = histogram_values(6000)
+    whole = Histogram(0, 100)
+    whole.add_values(array('d', values))
+    size = len(values) // parts + 1
+    chunks = []
+    for start in range(0, len(values), size):
+        chunk = Histogram(0, 100)
+        chunk.add_values(array('d', values[start:start + size]))
+        chunks.append(chunk)
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged.merge(chunk)
+    assert (merged.width, dict(merged.counts)) == (whole.width, dict(whole.counts))
+
+
+def test_infinities_and_nan_have_no_bin():
+    histogram = Histogram(0, 10)
+    for value in (1.0, math.inf, -math.inf, math.nan):
+        histogram.add(value)
+    histogram.add_values(array('d', [2.0, math.inf, math.nan]))
+    assert histogram.total() == 2
+    assert histogram.skipped == 5
+
+
+# Rank error of the quantile sketch documented at QUANTILE_SKETCH_K, and the
+# most a ModeSketch count can be too low
+RANK_ERROR = 0.0165
+
+
+def big_column(seed=17):
+    # More distinct values than EXACT_DISTINCT_LIMIT, plus one value that
+    # turns up often enough that the mode sketch has to keep it
+    count = EXACT_DISTINCT_LIMIT + 50000
+    values = [float(i) for i in range(count)] + [7.5] * (count // 100)
+    random.Random(seed).shuffle(values)
+    return values
+
+
+def rank(values, value):
+    return sum(1 for other in values if other < value) / len(values)
+
+
+def check_approximate(stats, values):
+    assert stats.approximate
+    for q in (0.1, 0.5, 0.9):
+        value = stats.median() if q == 0.5 else stats.quantile(q)
+        assert abs(rank(values, value) - q) <= RANK_ERROR, q
+    assert stats.mode() == 7.5
+
+
+def test_sketches_stay_within_their_error_bound():
+    values = big_column()
+    stats = ColumnStats()
+    for value in values:
+        stats.add(value)
+    check_approximate(stats, values)
+    # Everything but the median and mode stays exact
+    assert (stats.count, stats.minimum, stats.maximum) == (len(values), 0.0, EXACT_DISTINCT_LIMIT + 49999.0)
+
+
+def test_merged_sketches_stay_within_their_error_bound():
+    values = big_column(seed=19)
+    size = len(values) // 4 + 1
+    parts = []
+    for start in range(0, len(values), size):
+        part = ColumnStats()
+        for value in values[start:start + size]:
+            part.add(value)
+        parts.append(part)
+    # The parts are exact on their own, the merge goes over the limit
+    assert not any(part.approximate for part in parts)
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    check_approximate(merged, values)
+
+
+# A count is never too high, and too low by at most n / (k + 1)
+@pytest.mark.parametrize('k', [10, 50])
+def test_mode_sketch_count_bound(k):
+    rng = random.Random(k)
+    values = [int(rng.paretovariate(1.2)) for _ in range(50000)]
+    true_counts = Counter(values)
+    sketch = ModeSketch(k)
+    for value in values:
+        sketch.update(value)
+    assert sketch.error <= len(values) / (k + 1)
+    for value, count in true_counts.items():
+        assert count - len(values) / (k + 1) <= sketch.counters.get(value, 0) <= count
+    assert sketch.mode() == true_counts.most_common(1)[0][0]
+
+
+def test_small_columns_are_exact():
+    values = [float(i % 977) for i in range(20000)]
+    stats = ColumnStats()
+    for value in values:
+        stats.add(value)
+    assert not stats.approximate
+    assert stats.median() == statistics.median(values)
+    assert stats.mode() == statistics.mode(values)
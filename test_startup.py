@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+# Import-time budgets in seconds, measured in a fresh interpreter
+ENGINE_IMPORT_BUDGET = 0.5
+GUI_IMPORT_BUDGET = 1.0
+
+GUI_SCRIPT = "csv_analyzer_gui_v.1.6.py"
+
+# Runs in the child interpreter: import the target and report time and heavy modules
+PROBE = """
+import importlib.util, sys, time
+start = time.perf_counter()
+if sys.argv[1].endswith('.py'):
+    spec = importlib.util.spec_from_file_location('gui', sys.argv[1])
+    spec.loader.exec_module(importlib.util.module_from_spec(spec))
+else:
+    __import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(elapsed, 'tkinter' in sys.modules, 'matplotlib' in sys.modules)
+"""
+
+
+def measure(target, runs=3):
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", PROBE, target], cwd=here, capture_output=True, text=True, check=True).stdout.split()
+        elapsed = float(output[0])
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output[1] == "True", output[2] == "True"
+
+
+# Run with pytest (python -m pytest test_startup.py) or as a script
+def test_engine_import():
+    elapsed, has_tk, has_mpl = measure("csv_engine")
+    assert elapsed <= ENGINE_IMPORT_BUDGET, f"csv_engine took {elapsed:.3f}s to import (budget {ENGINE_IMPORT_BUDGET}s)"
+    assert not has_tk, "csv_engine must not import tkinter"
+    assert not has_mpl, "csv_engine must not import matplotlib"
+
+
+def test_gui_import():
+    elapsed, has_tk, has_mpl = measure(GUI_SCRIPT)
+    assert elapsed <= GUI_IMPORT_BUDGET, f"{GUI_SCRIPT} took {elapsed:.3f}s to import (budget {GUI_IMPORT_BUDGET}s)"
+    assert not has_mpl, f"{GUI_SCRIPT} must not import matplotlib until something is plotted"
+
+
+def main():
+    failures = []
+    for test in (test_engine_import, test_gui_import):
+        try:
+            test()
+        except AssertionError as e:
+            failures.append(str(e))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())